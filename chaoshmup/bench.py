@@ -0,0 +1,687 @@
+# Copyright (c) 2010, Morgan Lokhorst-Blight 
+# All rights reserved. 
+# 
+# Redistribution and use in source and binary forms, with or without 
+# modification, are permitted provided that the following conditions are met: 
+# 
+#  * Redistributions of source code must retain the above copyright notice, 
+#    this list of conditions and the following disclaimer. 
+#  * Redistributions in binary form must reproduce the above copyright 
+#    notice, this list of conditions and the following disclaimer in the 
+#    documentation and/or other materials provided with the distribution. 
+# 
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR AND CONTRIBUTORS ``AS IS'' AND ANY 
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED 
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE 
+# DISCLAIMED. IN NO EVENT SHALL THE AUTHOR OR CONTRIBUTORS BE LIABLE FOR ANY 
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES 
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR 
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER 
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT 
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY 
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH 
+# DAMAGE. 
+
+import math
+import multiprocessing
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import time
+
+import pygame
+
+from chaoshmup.world import World, Enemy, Player
+from chaoshmup.world.weapons import LaserBolt, PlasmaBall
+
+WINDOWWIDTH = 640
+WINDOWHEIGHT = 480
+DELTA = 1 / 60.0
+
+# Scenario name -> (enemies, projectiles kept alive, players, weapon fired)
+SCENARIOS = {
+    "idle": (15, 0, 2, None),
+    "firefight": (15, 0, 2, 2),
+    "swarm": (300, 0, 2, 2),
+    "bullet_hell": (50, 2000, 2, 2),
+    "beams": (300, 0, 8, 3),
+    }
+
+def build(name):
+    (enemies, projectiles, players, weapon) = SCENARIOS[name]
+    w = World(WINDOWWIDTH, WINDOWHEIGHT)
+    for i in range(players):
+        p = Player(w, "Player %d" % (i + 1), "Players")
+        p.position = ((WINDOWWIDTH * (i + 1)) / (players + 1), (WINDOWHEIGHT * 3) / 4)
+        if weapon is not None:
+            p.weapons[weapon].fire()
+        w.players.add(p)
+    for i in range(enemies):
+        e = Enemy(w)
+        e.position = (random.randint(20, WINDOWWIDTH - 20),
+                      random.randint(20, WINDOWHEIGHT / 2))
+        w.enemies.add(e)
+    return w
+
+def makeup(w, name):
+    (enemies, projectiles, players, weapon) = SCENARIOS[name]
+    for i in range(enemies - len(w.enemies)):
+        e = Enemy(w)
+        e.position = (random.randint(20, WINDOWWIDTH - 20),
+                      random.randint(20, WINDOWHEIGHT / 2))
+        w.enemies.add(e)
+    owners = w.enemies.sprites()
+    for i in range(projectiles - len(w.projectiles)):
+        owner = random.choice(owners)
+        w.projectiles.add(random.choice((LaserBolt, PlasmaBall))(
+            w, owner, (random.randint(0, WINDOWWIDTH), random.randint(0, WINDOWHEIGHT)),
+            random.uniform(0, 360)))
+
+def run(name, frames, screen):
+    random.seed(0)
+    w = build(name)
+    update_time = 0.0
+    draw_time = 0.0
+    for i in range(frames):
+        makeup(w, name)
+        start = time.time()
+        w.update(DELTA)
+        update_time += time.time() - start
+        start = time.time()
+        w.draw(screen)
+        draw_time += time.time() - start
+    return {"scenario": name, "frames": frames,
+            "update_ms": update_time / frames * 1000.0,
+            "draw_ms": draw_time / frames * 1000.0,
+            "sprites": w.renderer.sprites,
+            "render_us_per_sprite": w.renderer.stats()["us_per_sprite"],
+            "particles": w.particles.live,
+            "mask_tests": w.masks.tests / float(frames) if w.masks else 0.0}
+
+# A phase line of StartupTimer.report: "  %-12s %7.1fms"
+STARTUP_PHASE = re.compile(r"^  \S.{11} +\d+\.\dms$")
+
+# Cold-starts the game in a fresh interpreter and reads back its
+# time-to-first-frame breakdown.
+def run_startup(runs):
+    script = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "run.py")
+    env = dict(os.environ)
+    env.setdefault("SDL_VIDEODRIVER", "dummy")
+    totals = []
+    for i in range(runs):
+        start = time.time()
+        out = subprocess.Popen([sys.executable, script, "--first-frame"], env=env,
+                               stdout=subprocess.PIPE).communicate()[0]
+        wall = time.time() - start
+        lines = out.splitlines()
+        first = [i for (i, l) in enumerate(lines) if l.startswith("Time to first frame")][0]
+        report = [lines[first]]
+        # The startup timer's phase lines follow its header; anything else
+        # the game prints ends the table
+        for l in lines[first + 1:]:
+            if not STARTUP_PHASE.match(l):
+                break
+            report.append(l)
+        totals.append(wall)
+    totals.sort()
+    print "\n".join(report)
+    print "startup      process wall time over %d runs: median %.1fms, worst %.1fms" % (
+        runs, totals[len(totals) // 2] * 1000.0, totals[-1] * 1000.0)
+
+def run_memory(frames):
+    from chaoshmup import memory
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    pygame.init()
+    screen = pygame.display.set_mode((WINDOWWIDTH, WINDOWHEIGHT))
+    random.seed(0)
+    w = build("bullet_hell")
+    for i in range(frames):
+        makeup(w, "bullet_hell")
+        w.update(DELTA)
+    print memory.report(w)
+    owner = w.enemies.sprites()[0]
+    traced = memory.traced_bytes(lambda: LaserBolt(w, owner, (0, 0), 45))
+    if traced is not None:
+        print "LaserBolt allocation: %.0f bytes traced" % traced
+    pygame.quit()
+
+# Background draw cost should stay flat however long the level is
+def run_level(frames):
+    import tempfile
+    from chaoshmup.world.level import Level, generate_starfield
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    pygame.init()
+    screen = pygame.display.set_mode((WINDOWWIDTH, WINDOWHEIGHT))
+    for chunks in (8, 64):
+        path = os.path.join(tempfile.gettempdir(), "chaoshmup-bench-%d.lvl" % chunks)
+        generate_starfield(path, (WINDOWWIDTH, 128), chunks)
+        level = Level(path)
+        start = time.time()
+        for i in range(frames):
+            # Scroll fast enough to cross every chunk of the longer level
+            level.draw(screen, i * 64.0)
+        elapsed = time.time() - start
+        print "level %3d chunks  draw %.2fms/frame" % (chunks, elapsed / frames * 1000.0)
+        print level.report()
+        level.close()
+        os.remove(path)
+    pygame.quit()
+
+# Background load for run_host: a socket pair pumping data through the host
+# and a file writer, each yielding whenever it would block or every chunk.
+def pump(host, sock, moved):
+    chunk = "x" * 4096
+    while True:
+        yield host.writable(sock)
+        try:
+            moved[0] += sock.send(chunk)
+        except socket.error:
+            pass
+
+def drain(host, sock, moved):
+    while True:
+        yield host.readable(sock)
+        try:
+            moved[1] += len(sock.recv(65536))
+        except socket.error:
+            pass
+
+def log_writer(host, f, moved):
+    line = "%s\n" % ("telemetry " * 20)
+    while True:
+        for i in range(16):
+            f.write(line)
+        f.flush()
+        moved[2] += len(line) * 16
+        yield None
+
+# Frame pacing under the host, alone and sharing the process with socket and
+# file I/O; the pacing reports should match.
+def run_host(frames):
+    import tempfile
+    from chaoshmup.host import Host
+    from chaoshmup import host as hosting
+    from chaoshmup.pacer import FramePacer
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    pygame.init()
+    screen = pygame.display.set_mode((WINDOWWIDTH, WINDOWHEIGHT))
+    for load in (False, True):
+        random.seed(0)
+        w = build("firefight")
+        pacer = FramePacer(60)
+        host = Host()
+        count = [0]
+        moved = [0, 0, 0]
+        def frame(delta):
+            count[0] += 1
+            if count[0] > frames:
+                return False
+            makeup(w, "firefight")
+            w.update(DELTA)
+            w.draw(screen)
+            return True
+        if load:
+            (a, b) = socket.socketpair()
+            a.setblocking(False)
+            b.setblocking(False)
+            f = tempfile.TemporaryFile()
+            host.spawn(pump(host, a, moved))
+            host.spawn(drain(host, b, moved))
+            host.spawn(log_writer(host, f, moved))
+        start = time.time()
+        host.run(hosting.frames(host, pacer, frame, pygame.display.flip))
+        elapsed = time.time() - start
+        if load:
+            a.close()
+            b.close()
+            f.close()
+            print "host with I/O  %.1fMB/s through sockets, %.1fMB/s to file, %d task steps" % (
+                moved[1] / elapsed / 1e6, moved[2] / elapsed / 1e6, host.steps)
+        else:
+            print "host alone     %d task steps" % host.steps
+        print pacer.report()
+    pygame.quit()
+
+# Update cost with every system at the tick rate against each at its own rate
+def run_rates(frames, screen):
+    for name in ("firefight", "swarm", "bullet_hell"):
+        for multirate in (False, True):
+            World.MULTIRATE = multirate
+            random.seed(0)
+            w = build(name)
+            for i in range(frames):
+                makeup(w, name)
+                w.update(DELTA)
+                w.draw(screen)
+            print "%-12s %s" % (name, ("multi-rate" if multirate else "every tick"))
+            print w.schedule.report()
+    World.MULTIRATE = True
+
+# A HUD of n fields, some fraction of which change every frame, drawn with a
+# font.render per field against the glyph atlas HUD
+def run_hud(frames, screen):
+    from chaoshmup.hud import HUD
+    font = pygame.font.Font(None, 20)
+    # The dummy video driver's screen is 8-bit, where every alpha blit is
+    # slow; draw to a 32-bit surface as on a real display
+    screen = pygame.Surface(screen.get_size(), 0, 32)
+    for n in (10, 25, 50):
+        positions = [((i % 5) * 128, (i // 5) * 20) for i in range(n)]
+        for changing in (1.0, 0.2, 0.0):
+            values = [0] * n
+            start = time.time()
+            for frame in range(frames):
+                for i in range(int(n * changing)):
+                    values[i] += 7
+                for i in range(n):
+                    screen.blit(font.render("Field %d: %d" % (i, values[i]), 1, (255, 255, 255)),
+                                positions[i])
+            rendered = (time.time() - start) / frames * 1000.0
+            hud = HUD(font)
+            for i in range(n):
+                hud.field(i, positions[i], "Field %d: %%d" % i)
+            values = [0] * n
+            start = time.time()
+            for frame in range(frames):
+                for i in range(int(n * changing)):
+                    values[i] += 7
+                for i in range(n):
+                    hud.set(i, values[i])
+                hud.draw(screen)
+            atlas = (time.time() - start) / frames * 1000.0
+            print "hud %2d fields, %3.0f%% changing  font.render %.3fms  atlas %.3fms  (%.1fx)" % (
+                n, changing * 100.0, rendered, atlas, rendered / atlas)
+
+# Hundreds of enemies sharing a few path tables, advanced with numpy and
+# with the plain Python fallback
+def run_paths(frames):
+    from chaoshmup.world import PathEnemy, paths
+    from chaoshmup.world.systems import PathSystem
+    numpy = paths.numpy
+    for count in (100, 500, 2000):
+        for vectorised in (False, True):
+            paths.numpy = numpy if vectorised else None
+            w = World(WINDOWWIDTH, WINDOWHEIGHT)
+            names = sorted(paths.PATHS)
+            for i in range(count):
+                e = PathEnemy(w)
+                e.follow(names[i % len(names)], (WINDOWWIDTH / 2, 100), i * 7.0)
+                w.enemies.add(e)
+            system = PathSystem()
+            start = time.time()
+            for i in range(frames):
+                system.run(w, DELTA)
+            elapsed = (time.time() - start) / frames
+            print "paths %4d followers  %-6s  %.3fms/tick  %.2fus/follower" % (
+                count, "numpy" if vectorised else "python", elapsed * 1000.0,
+                elapsed / count * 1e6)
+    paths.numpy = numpy
+
+# An arena four screens across and down with the camera following a player,
+# drawing and rotating only what is near the view against everything
+def run_camera(frames, screen):
+    arena = (WINDOWWIDTH * 4, WINDOWHEIGHT * 4)
+    for cull in (False, True):
+        random.seed(0)
+        w = World(arena[0], arena[1], (WINDOWWIDTH, WINDOWHEIGHT))
+        w.camera.cull = cull
+        for i in range(2):
+            p = Player(w, "Player %d" % (i + 1), "Players")
+            p.position = (arena[0] / 2 + i * 100, arena[1] / 2)
+            p.weapons[2].fire()
+            w.players.add(p)
+        player = w.players.sprites()[0]
+        update_time = 0.0
+        draw_time = 0.0
+        for i in range(frames):
+            for j in range(800 - len(w.enemies)):
+                e = Enemy(w)
+                e.position = (random.randint(20, arena[0] - 20), random.randint(20, arena[1] - 20))
+                w.enemies.add(e)
+            player.velocity = (120, 60)
+            start = time.time()
+            w.update(DELTA)
+            update_time += time.time() - start
+            w.camera.move(player.rect.center)
+            start = time.time()
+            w.draw(screen)
+            draw_time += time.time() - start
+        print "camera %-8s update %6.2fms  draw %6.2fms  %s" % (
+            "culling" if cull else "all", update_time / frames * 1000.0,
+            draw_time / frames * 1000.0, w.camera.report())
+
+# The swarm with every enemy in a team palette and flashing when hit: plain
+# rotation, tinting every time a frame is redrawn, and the variant cache
+def run_tints(frames, screen):
+    from chaoshmup.world.tints import PALETTES
+    names = sorted(p for p in PALETTES if p != "flash")
+    for (label, palettes, max_bytes) in (("untinted", False, None), ("uncached", True, 1),
+                                         ("cached", True, None)):
+        random.seed(0)
+        w = build("swarm")
+        if max_bytes:
+            w.tints.max_bytes = max_bytes
+        update_time = 0.0
+        for i in range(frames):
+            makeup(w, "swarm")
+            if palettes:
+                for e in w.enemies:
+                    if e.palette is None:
+                        e.palette = random.choice(names)
+            start = time.time()
+            w.update(DELTA)
+            update_time += time.time() - start
+            w.draw(screen)
+        print "tints %-9s update %6.2fms  %s" % (label, update_time / frames * 1000.0,
+                                                  w.tints.report())
+
+# What looking ahead costs: forking the whole bullet hell and just the area
+# around a player, stepping a fork, and every player trying eight headings a
+# quarter of a second ahead each tick
+def run_fork(frames, screen):
+    from chaoshmup.world.fork import lookahead
+    random.seed(0)
+    w = build("bullet_hell")
+    makeup(w, "bullet_hell")
+    w.update(DELTA)
+    player = w.players.sprites()[0]
+    area = player.rect.inflate(320, 320)
+    for (label, a) in (("world", None), ("area", area)):
+        start = time.time()
+        for i in range(frames):
+            fork = w.fork(a)
+        fork_time = (time.time() - start) / frames
+        start = time.time()
+        for i in range(frames):
+            fork.step(DELTA)
+        step_time = (time.time() - start) / frames
+        n = len(fork.store)
+        print "fork %-5s %5d entities  fork %7.3fms (%5.2fus/entity)  step %7.3fms (%5.2fus/entity)" % (
+            label, n, fork_time * 1000.0, fork_time * 1e6 / n, step_time * 1000.0,
+            step_time * 1e6 / n)
+    # Standing still and 24 headings, for each player every tick
+    options = [(0, 0)] + [(math.cos(math.radians(a)) * 200, math.sin(math.radians(a)) * 200)
+                          for a in range(0, 360, 15)]
+    for name in ("swarm", "bullet_hell"):
+        random.seed(0)
+        w = build(name)
+        update_time = 0.0
+        ahead_time = 0.0
+        forks = 0
+        for i in range(frames):
+            makeup(w, name)
+            start = time.time()
+            for p in w.players:
+                (p.velocity, scores) = lookahead(w, p, options)
+                forks += len(options)
+            ahead_time += time.time() - start
+            start = time.time()
+            w.update(DELTA)
+            update_time += time.time() - start
+            w.draw(screen)
+        print "fork lookahead %-12s %d forks/tick  %6.2fms/tick (%5.3fms/fork)  update %6.2fms/tick" % (
+            name, forks / frames, ahead_time / frames * 1000.0, ahead_time / forks * 1000.0,
+            update_time / frames * 1000.0)
+
+# Spinning enemies at scattered angles, so every sprite asks for a rotation
+# each time the animation system reaches it and most are served from the
+# cached rotation steps, with the rest run inline and on 2, 4 and 8 threads
+def run_transforms(frames, screen):
+    from chaoshmup.world.transforms import TransformPool
+    print "transforms on %d cpus" % multiprocessing.cpu_count()
+    base = None
+    for workers in (1, 2, 4, 8):
+        random.seed(0)
+        w = World(WINDOWWIDTH, WINDOWHEIGHT)
+        w.transforms = TransformPool(w.tints, workers)
+        for i in range(600):
+            e = Enemy(w)
+            e.position = (random.randint(20, WINDOWWIDTH - 20), random.randint(20, WINDOWHEIGHT - 20))
+            e.orientation = random.uniform(0, 360)
+            e.rotation = random.uniform(-180, 180)
+            e.weapons[0].disarm()
+            w.enemies.add(e)
+        start = time.time()
+        for i in range(frames):
+            w.update(DELTA)
+            w.draw(screen)
+        tick = (time.time() - start) / frames
+        s = w.transforms.stats()
+        if base is None:
+            base = s["ms_per_batch"]
+        print ("transforms %d workers  tick %6.2fms  transforms %6.2fms/batch  speedup %4.2fx  "
+               "%4.0f rotated/tick  %3.0f reused/tick" % (
+                   workers, tick * 1000.0, s["ms_per_batch"], base / s["ms_per_batch"],
+                   s["rotated"] / float(frames), s["reused"] / float(frames)))
+
+# The event bus on its own: a tick's worth of hits emitted and dispatched to
+# 0, 1, 4 and 16 subscribers that each walk the batch, then what the game
+# scenarios put through it
+def run_events(frames, screen):
+    from chaoshmup.world.events import EventBus
+    events = 2000
+    for subscribers in (0, 1, 4, 16):
+        bus = EventBus()
+        seen = [0]
+        def subscriber(batch):
+            seen[0] += sum(batch.columns["damage"])
+        for i in range(subscribers):
+            bus.subscribe("hit", subscriber)
+        emit_time = 0.0
+        for i in range(frames):
+            start = time.time()
+            for j in xrange(events):
+                bus.emit("hit", None, None, 1.0)
+            emit_time += time.time() - start
+            bus.dispatch()
+        print "events %2d subscribers  emit %5.2fus/event  dispatch %6.3fms/tick  %8.0f events/sec" % (
+            subscribers, emit_time / (frames * events) * 1e6, bus.stats()["dispatch_ms"],
+            frames * events / (emit_time + bus.time))
+    for name in ("firefight", "swarm", "bullet_hell"):
+        random.seed(0)
+        w = build(name)
+        for i in range(frames):
+            makeup(w, name)
+            w.update(DELTA)
+            w.draw(screen)
+        print "events %-12s %s" % (name, w.events.report())
+
+# Emission cost per bullet for each pattern, fired as batched volleys and
+# as one projectile at a time along the same headings
+def run_patterns(frames, screen):
+    from chaoshmup.world import patterns
+    from chaoshmup.world.weapons import PatternWeapon
+    volleys = max(1, min(frames, 50))
+    random.seed(0)
+    w = build("idle")
+    owner = w.enemies.sprites()[0]
+    for name in sorted(patterns.PATTERNS):
+        weapon = type("Bench", (PatternWeapon,), {"PROJECTILE_TYPE": PlasmaBall})(w, owner, name)
+        pattern = weapon.pattern
+        batched = single = 0.0
+        for i in range(volleys):
+            start = time.time()
+            weapon.spawn_projectile()
+            w.transforms.apply()
+            batched += time.time() - start
+            w.remove(w.projectiles.sprites())
+            headings = pattern.headings(i, owner.orientation, owner.orientation)
+            start = time.time()
+            w.projectiles.add([PlasmaBall(w, owner, owner.position, h) for h in headings])
+            w.transforms.apply()
+            single += time.time() - start
+            w.remove(w.projectiles.sprites())
+            w.events.dispatch()
+        shots = float(volleys * len(pattern))
+        print "patterns %-14s %4d bullets/volley  batched %5.2fus/bullet  single %5.2fus/bullet  %4.1fx" % (
+            name, len(pattern), batched / shots * 1e6, single / shots * 1e6, single / batched)
+    # A few enemies filling the screen with a pattern each
+    random.seed(0)
+    w = build("idle")
+    for e in w.enemies.sprites()[:4]:
+        weapon = type("Bench", (PatternWeapon,), {"PROJECTILE_TYPE": PlasmaBall,
+                                                  "RATE_OF_FIRE": 0.25})(w, e, "flower")
+        e.weapons.append(weapon)
+        weapon.fire()
+    update = 0.0
+    for i in range(frames):
+        start = time.time()
+        w.update(DELTA)
+        update += time.time() - start
+        w.draw(screen)
+    print "patterns flower x4        %5d projectiles  update %6.2fms" % (
+        len(w.projectiles), update / frames * 1000.0)
+
+def run_shard(frames):
+    from chaoshmup import shard
+    for s in shard.benchmark(ticks=frames):
+        print ("shard %(workers)2d workers  %(entities)5d entities  %(ticks_per_sec)6.1f ticks/sec  "
+               "speedup %(speedup)5.2fx  efficiency %(efficiency)4.0f%%  "
+               "busiest worker %(busy_ms)6.2fms  %(exchanged)5.0f border rows/tick" % dict(
+                   s, efficiency=s["efficiency"] * 100.0))
+    # Ships respawn when killed and bounce off the arena walls, so however
+    # they move between strips every tick must end with as many as it began
+    ships = 2000
+    world = shard.ShardedWorld(2000, 1500, 4, ships)
+    for i in range(frames):
+        world.step(DELTA)
+        if world.stats()["ships"] != ships:
+            world.close()
+            raise AssertionError("shard tick %d: %d of %d ships left" % (
+                i, world.stats()["ships"], ships))
+    world.close()
+    region = shard.Region(0, 0, 100, (100, 100), 0)
+    region.rows = shard.random_ships(1, (99, 99, 100), shard.numpy.random.RandomState(0))
+    region.rows[:, shard.VX] = 600.0
+    outgoing = region.move(DELTA)
+    if (outgoing[1], outgoing[3], region.ships()) != (0, 0, 1):
+        raise AssertionError("shard wall bounce handed a ship off the arena")
+    print "shard check  %d ships kept over %d ticks, wall bounces stay in the strip" % (
+        ships, frames)
+    # Drawing a screen-sized view of the merged state from shared memory
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    pygame.init()
+    screen = pygame.display.set_mode((WINDOWWIDTH, WINDOWHEIGHT))
+    world = shard.ShardedWorld(16000, 12000, 4, 20000)
+    world.step(DELTA)
+    start = time.time()
+    for i in range(frames):
+        drawn = world.draw(screen, (i * 4, 6000))
+    print "shard view   draw %.2fms/frame, %d of %d entities on screen" % (
+        (time.time() - start) / frames * 1000.0, drawn, len(world.entities()))
+    world.close()
+    pygame.quit()
+
+def main(args=None):
+    if args is None:
+        args = sys.argv[1:]
+    frames = 300
+    names = []
+    for a in args:
+        if a.isdigit():
+            frames = int(a)
+        else:
+            names.append(a)
+    if "memory" in names:
+        names.remove("memory")
+        run_memory(frames)
+        if not names:
+            return
+    if "env" in names:
+        names.remove("env")
+        from chaoshmup import env
+        for n in (1, 8, 32):
+            print "env %2d worlds  %8.0f env-steps/sec" % (n, env.benchmark(n, frames))
+        print "env %2d worlds  %8.0f env-steps/sec with 80x60 pixels" % (
+            8, env.benchmark(8, frames, (80, 60)))
+        if not names:
+            return
+    if "level" in names:
+        names.remove("level")
+        run_level(frames)
+        if not names:
+            return
+    if "host" in names:
+        names.remove("host")
+        run_host(frames)
+        if not names:
+            return
+    if "paths" in names:
+        names.remove("paths")
+        os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+        pygame.init()
+        pygame.display.set_mode((WINDOWWIDTH, WINDOWHEIGHT))
+        run_paths(frames)
+        pygame.quit()
+        if not names:
+            return
+    if "shard" in names:
+        names.remove("shard")
+        run_shard(frames)
+        if not names:
+            return
+    if "startup" in names:
+        names.remove("startup")
+        run_startup(5)
+        if not names:
+            return
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    pygame.init()
+    screen = pygame.display.set_mode((WINDOWWIDTH, WINDOWHEIGHT))
+    if "hud" in names:
+        names.remove("hud")
+        run_hud(frames, screen)
+        if not names:
+            pygame.quit()
+            return
+    if "camera" in names:
+        names.remove("camera")
+        run_camera(frames, screen)
+        if not names:
+            pygame.quit()
+            return
+    if "tints" in names:
+        names.remove("tints")
+        run_tints(frames, screen)
+        if not names:
+            pygame.quit()
+            return
+    if "transforms" in names:
+        names.remove("transforms")
+        run_transforms(frames, screen)
+        if not names:
+            pygame.quit()
+            return
+    if "events" in names:
+        names.remove("events")
+        run_events(frames, screen)
+        if not names:
+            pygame.quit()
+            return
+    if "patterns" in names:
+        names.remove("patterns")
+        run_patterns(frames, screen)
+        if not names:
+            pygame.quit()
+            return
+    if "fork" in names:
+        names.remove("fork")
+        run_fork(frames, screen)
+        if not names:
+            pygame.quit()
+            return
+    if "rates" in names:
+        names.remove("rates")
+        run_rates(frames, screen)
+        if not names:
+            pygame.quit()
+            return
+    for name in names or sorted(SCENARIOS):
+        r = run(name, frames, screen)
+        print ("%(scenario)-12s %(sprites)5d sprites  update %(update_ms)7.2fms  "
+               "draw %(draw_ms)6.2fms  render %(render_us_per_sprite)5.2fus/sprite  "
+               "%(particles)4d particles  %(mask_tests)5.1f mask tests/frame" % r)
+    pygame.quit()
@@ -0,0 +1,173 @@
+# Copyright (c) 2010, Morgan Lokhorst-Blight 
+# All rights reserved. 
+# 
+# Redistribution and use in source and binary forms, with or without 
+# modification, are permitted provided that the following conditions are met: 
+# 
+#  * Redistributions of source code must retain the above copyright notice, 
+#    this list of conditions and the following disclaimer. 
+#  * Redistributions in binary form must reproduce the above copyright 
+#    notice, this list of conditions and the following disclaimer in the 
+#    documentation and/or other materials provided with the distribution. 
+# 
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR AND CONTRIBUTORS ``AS IS'' AND ANY 
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED 
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE 
+# DISCLAIMED. IN NO EVENT SHALL THE AUTHOR OR CONTRIBUTORS BE LIABLE FOR ANY 
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES 
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR 
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER 
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT 
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY 
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH 
+# DAMAGE. 
+
+import os
+import subprocess
+import threading
+from distutils.spawn import find_executable
+from Queue import Queue, Empty, Full
+
+import pygame
+
+# Screenshots and recordings are handed to a background worker through a
+# bounded queue. The game loop only ever copies the frame; if the worker
+# falls behind, frames are dropped instead of stalling the loop. Nothing
+# else goes through the queue: each frame carries the number of the
+# recording it belongs to, and the worker starts a new file when that
+# changes. Stopping and quitting are flags the worker checks whenever the
+# queue runs dry, so they never wait for space either.
+class Capture(object):
+    QUEUE_SIZE = 8
+    POLL = 0.1
+    FRAMERATE = 60
+    ENCODER = ["ffmpeg", "-loglevel", "error", "-y", "-f", "rawvideo",
+               "-pix_fmt", "rgb24", "-s", "%(width)dx%(height)d",
+               "-r", "%(framerate)d", "-i", "-", "%(name)s.mp4"]
+    def __init__(self, directory=None):
+        self.directory = directory or os.getcwd()
+        self.queue = Queue(self.QUEUE_SIZE)
+        self.recording = False
+        self.session = 0
+        self.quitting = threading.Event()
+        self.output = None
+        self.encoder = None
+        self.saved = 0
+        self.recorded = 0
+        self.dropped = 0
+        self.counters = {}
+        self.worker = threading.Thread(target=self.run, name="capture")
+        self.worker.daemon = True
+        self.worker.start()
+
+    def put(self, job):
+        try:
+            self.queue.put_nowait(job)
+            return True
+        except Full:
+            self.dropped += 1
+            return False
+
+    def screenshot(self, surface):
+        self.put(("screenshot", surface.copy()))
+
+    def start_recording(self):
+        if not self.recording:
+            self.recording = True
+            self.session += 1
+
+    def stop_recording(self):
+        self.recording = False
+
+    def toggle_recording(self):
+        if self.recording:
+            self.stop_recording()
+        else:
+            self.start_recording()
+
+    def frame(self, surface):
+        if not self.recording:
+            return
+        self.put(("frame", (self.session, surface.get_size(),
+                            pygame.image.tostring(surface, "RGB"))))
+
+    def close(self):
+        self.stop_recording()
+        self.quitting.set()
+        self.worker.join()
+
+    def next_name(self, prefix, suffix):
+        # Scan the directory once per prefix, then count locally
+        if prefix not in self.counters:
+            nums = [x[len(prefix):-len(suffix)] for x in os.listdir(self.directory)
+                    if x.startswith(prefix) and x.endswith(suffix)]
+            nums = [int(n) for n in nums if n.isdigit()]
+            self.counters[prefix] = max(nums or [0])
+        self.counters[prefix] += 1
+        return os.path.join(self.directory, "%s%d" % (prefix, self.counters[prefix]))
+
+    def run(self):
+        current = None
+        while True:
+            try:
+                (kind, data) = self.queue.get(timeout=self.POLL)
+            except Empty:
+                # Everything queued has been written
+                if self.quitting.is_set():
+                    self.finish()
+                    return
+                if current is not None and not (self.recording and self.session == current):
+                    self.finish()
+                    current = None
+                continue
+            if kind == "screenshot":
+                name = self.next_name("screenshot_", ".png") + ".png"
+                print "Saving screenshot as %s" % name
+                pygame.image.save(data, name)
+                self.saved += 1
+            elif kind == "frame":
+                (session, size, pixels) = data
+                if session != current:
+                    self.begin(size)
+                    current = session
+                if self.output or self.encoder:
+                    self.write(pixels)
+
+    def begin(self, size):
+        self.finish()
+        if find_executable(self.ENCODER[0]):
+            name = self.next_name("recording_", ".mp4")
+            args = [a % {"width": size[0], "height": size[1],
+                         "framerate": self.FRAMERATE, "name": name}
+                    for a in self.ENCODER]
+            print "Recording to %s.mp4" % name
+            self.encoder = subprocess.Popen(args, stdin=subprocess.PIPE)
+        else:
+            # No encoder available; write a raw RGB frame sequence instead
+            suffix = "_%dx%d.rgb" % size
+            name = self.next_name("recording_", suffix) + suffix
+            print "Recording raw frames to %s" % name
+            self.output = open(name, "wb")
+
+    def write(self, data):
+        try:
+            if self.encoder:
+                self.encoder.stdin.write(data)
+            else:
+                self.output.write(data)
+            self.recorded += 1
+        except IOError:
+            self.finish()
+
+    def finish(self):
+        if self.encoder:
+            self.encoder.stdin.close()
+            self.encoder.wait()
+            self.encoder = None
+        if self.output:
+            self.output.close()
+            self.output = None
+
+    def report(self):
+        return ("Capture: %d screenshots, %d frames recorded, %d dropped"
+                % (self.saved, self.recorded, self.dropped))
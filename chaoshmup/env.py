@@ -0,0 +1,158 @@
+# Copyright (c) 2010, Morgan Lokhorst-Blight 
+# All rights reserved. 
+# 
+# Redistribution and use in source and binary forms, with or without 
+# modification, are permitted provided that the following conditions are met: 
+# 
+#  * Redistributions of source code must retain the above copyright notice, 
+#    this list of conditions and the following disclaimer. 
+#  * Redistributions in binary form must reproduce the above copyright 
+#    notice, this list of conditions and the following disclaimer in the 
+#    documentation and/or other materials provided with the distribution. 
+# 
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR AND CONTRIBUTORS ``AS IS'' AND ANY 
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED 
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE 
+# DISCLAIMED. IN NO EVENT SHALL THE AUTHOR OR CONTRIBUTORS BE LIABLE FOR ANY 
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES 
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR 
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER 
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT 
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY 
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH 
+# DAMAGE. 
+
+import time
+
+import numpy
+import pygame
+
+from chaoshmup.controller import PlayerController
+from chaoshmup.game import generate_world, random_enemy, WINDOWWIDTH, WINDOWHEIGHT
+from chaoshmup.world import Enemy
+
+# Per-entity observation features, in order
+FEATURES = ("x", "y", "vx", "vy", "orientation", "health", "hostile")
+
+# Steps N independent worlds in lockstep for agent training. Actions are an
+# (N, players, actions) array of button states mapped onto each player's
+# PlayerController input actions; a change from 0 to 1 presses the button and
+# 1 to 0 releases it. Observations are written into arrays allocated once at
+# construction. The reward is the number of enemies killed in the step,
+# counted from each world's "kill" events.
+class VecEnv(object):
+    DELTA = 1 / 60.0
+    MAX_ENTITIES = 512
+    ENEMIES = 15
+    def __init__(self, n, max_entities=None, pixels=None, delta=None):
+        self.n = n
+        self.delta = delta or self.DELTA
+        self.max_entities = max_entities or self.MAX_ENTITIES
+        self.worlds = [None] * n
+        self.controllers = [None] * n
+        self.rewards = numpy.zeros(n, numpy.float64)
+        for i in range(n):
+            self.make_world(i)
+        self.players = len(self.controllers[0])
+        self.num_actions = len(self.controllers[0][0].input_actions)
+        self.actions = numpy.zeros((n, self.players, self.num_actions), numpy.bool_)
+        self.entities = numpy.zeros((n, self.max_entities, len(FEATURES)), numpy.float64)
+        self.counts = numpy.zeros(n, numpy.int32)
+        self.steps = 0
+        self.step_time = 0.0
+
+        # Optional downscaled pixel observations, rendered off-screen
+        self.pixels = None
+        if pixels:
+            (pw, ph) = pixels
+            self.screen = pygame.Surface((WINDOWWIDTH, WINDOWHEIGHT))
+            self.small = pygame.Surface((pw, ph))
+            self.pixels = numpy.zeros((n, pw, ph, 3), numpy.uint8)
+
+    def reset(self, i):
+        self.make_world(i)
+        self.actions[i] = False
+
+    def make_world(self, i):
+        w = generate_world()
+        self.worlds[i] = w
+        self.controllers[i] = [PlayerController(p) for p in
+                               sorted(w.players.sprites(), key=lambda p: p.name)]
+        w.events.subscribe("kill", lambda kills: self.killed(i, kills))
+
+    def killed(self, i, kills):
+        self.rewards[i] += sum(1 for entity in kills.columns["entity"]
+                               if isinstance(entity, Enemy))
+
+    def apply(self, i, actions):
+        held = self.actions[i]
+        for (p, controller) in enumerate(self.controllers[i]):
+            for a in numpy.flatnonzero(actions[p] != held[p]):
+                action = controller.input_actions[a]
+                func = action.down_func if actions[p][a] else action.up_func
+                if func:
+                    func()
+        held[...] = actions
+
+    def step(self, actions):
+        start = time.time()
+        for (i, w) in enumerate(self.worlds):
+            self.apply(i, actions[i])
+            self.rewards[i] = 0.0
+            w.update(self.delta)
+            for j in range(self.ENEMIES - (len(w.enemies) + len(w.explosions))):
+                w.enemies.add(random_enemy(w))
+            self.observe(i)
+        self.steps += self.n
+        self.step_time += time.time() - start
+        return (self.entities, self.rewards)
+
+    def observe(self, i):
+        w = self.worlds[i]
+        out = self.entities[i]
+        row = 0
+        for arch in w.store.query("transform", "sprite"):
+            c = arch.columns
+            n = min(len(arch), self.max_entities - row)
+            if n <= 0:
+                break
+            rows = out[row:row + n]
+            for (f, field) in enumerate(FEATURES[:5]):
+                if field in c:
+                    rows[:, f] = numpy.frombuffer(c[field], numpy.float64, n)
+                else:
+                    rows[:, f] = 0.0
+            if "health" in c:
+                rows[:, 5] = numpy.frombuffer(c["health"], numpy.float64, n)
+            else:
+                rows[:, 5] = 0.0
+            if "team" in c:
+                rows[:, 6] = [t == "Enemy" for t in c["team"][:n]]
+            else:
+                rows[:, 6] = 0.0
+            row += n
+        out[row:] = 0.0
+        self.counts[i] = row
+
+        if self.pixels is not None:
+            w.draw(self.screen)
+            pygame.transform.scale(self.screen, self.small.get_size(), self.small)
+            view = pygame.surfarray.pixels3d(self.small)
+            self.pixels[i] = view
+            del view
+
+    def throughput(self):
+        if not self.step_time:
+            return 0.0
+        return self.steps / self.step_time
+
+def benchmark(n=8, steps=600, pixels=None):
+    env = VecEnv(n, pixels=pixels)
+    actions = numpy.zeros(env.actions.shape, numpy.bool_)
+    for s in range(steps):
+        # Hold fire, change thrusters every half second
+        actions[:, :, 4] = True
+        if s % 30 == 0:
+            actions[:, :, :4] = numpy.random.rand(n, env.players, 4) < 0.3
+        env.step(actions)
+    return env.throughput()
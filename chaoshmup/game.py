@@ -24,35 +24,85 @@
 
 import os
 import random
+import sys
+import tempfile
+import time
+
+STARTED = time.time()
 
 import pygame
 from pygame.locals import *
 
-from chaoshmup.world import *
-from chaoshmup.controller import *
+from chaoshmup.world import World, Enemy, PathEnemy, Player, assets, image_files
+from chaoshmup.world import paths
+from chaoshmup.controller import InputAction, PlayerController
+from chaoshmup.pacer import FramePacer
+from chaoshmup.hud import HUD
 
 
 WINDOWWIDTH = 640
 WINDOWHEIGHT = 480
 FRAMERATE = 60
+LEVEL_FILE = os.path.join(tempfile.gettempdir(), "chaoshmup-starfield.lvl")
+
+class StartupTimer(object):
+    def __init__(self, started=STARTED):
+        self.started = started
+        self.last = started
+        self.phases = []
+
+    def mark(self, phase):
+        now = time.time()
+        self.phases.append((phase, now - self.last))
+        self.last = now
+
+    def report(self):
+        lines = ["Time to first frame: %.1fms" % ((self.last - self.started) * 1000.0)]
+        for (phase, t) in self.phases:
+            lines.append("  %-12s %7.1fms" % (phase, t * 1000.0))
+        return "\n".join(lines)
 
-def initialise():
-    pygame.init()
+def initialise(timer=None, vsync=False):
+    # Decode images on worker threads while the display comes up. Only the
+    # pygame modules the game uses are initialised (no mixer, no joystick).
+    preload = assets.preload(image_files())
+    pygame.display.init()
     pygame.font.init()
     random.seed()
+    flags = 0
+    if vsync:
+        flags = DOUBLEBUF | HWSURFACE
+    screen = pygame.display.set_mode((WINDOWWIDTH, WINDOWHEIGHT), flags)
+    if timer:
+        timer.mark("display")
+    assets.install(preload)
+    if timer:
+        timer.mark("assets")
+    return screen
 
-    return pygame.display.set_mode((WINDOWWIDTH, WINDOWHEIGHT))
 
+def load_level(path=LEVEL_FILE):
+    from chaoshmup.world.level import Level, generate_starfield
+    # There are no shipped levels yet, so build the demo starfield once
+    if not os.path.exists(path):
+        print "Generating level %s" % path
+        generate_starfield(path, (WINDOWWIDTH, 128))
+    return Level(path)
 
-def generate_world():
+def generate_world(level=None):
     w = World(WINDOWWIDTH, WINDOWHEIGHT)
+    w.level = level
 
     p = Player(w, "Player 1", "Players")
-    p.rect.center = ((WINDOWWIDTH * 1) / 4, (WINDOWHEIGHT * 3) / 4)
+    p.position = ((WINDOWWIDTH * 1) / 4, (WINDOWHEIGHT * 3) / 4)
+    p.palette = "blue"
+    p.repaint()
     w.players.add(p)
 
     p = Player(w, "Player 2", "Players")
-    p.rect.center = ((WINDOWWIDTH * 3) / 4, (WINDOWHEIGHT * 3) / 4)
+    p.position = ((WINDOWWIDTH * 3) / 4, (WINDOWHEIGHT * 3) / 4)
+    p.palette = "red"
+    p.repaint()
     w.players.add(p)
     
     return w
@@ -63,28 +113,81 @@ def random_enemy(w):
                   random.randint(20, WINDOWHEIGHT / 2))
     return e
 
+# A line of enemies following one path, spaced out along it
+def formation(w, name, origin, count, spacing=40.0):
+    for i in range(count):
+        e = PathEnemy(w)
+        e.follow(name, origin, i * spacing)
+        w.enemies.add(e)
+
+def random_formation(w, count):
+    name = random.choice(sorted(n for (n, p) in paths.PATHS.iteritems() if p[2]))
+    origin = (random.randint(WINDOWWIDTH / 4, WINDOWWIDTH * 3 / 4), random.randint(40, 100))
+    formation(w, name, origin, count)
+
+# Makeup enemy numbers - this is really only temporary
+def makeup(w, enemies=15):
+    count = enemies - (len(w.enemies) + len(w.explosions))
+    if count >= 5 and random.random() < 0.5:
+        random_formation(w, 5)
+    elif count > 0:
+        for i in range(count):
+            w.enemies.add(random_enemy(w))
+
+_capture = []
+def capture():
+    # The capture worker is only imported and started when first used
+    if not _capture:
+        from chaoshmup.capture import Capture
+        _capture.append(Capture())
+    return _capture[0]
+
+# Stands in for the FrameProfiler until a capture is first asked for
+class NoProfiler(object):
+    def frame_start(self):
+        pass
+    def mark(self, phase):
+        pass
+    def pause(self, phase):
+        pass
+    def frame_end(self):
+        pass
+
+_profiler = []
+def frame_profiler(schedule=None):
+    # The profiler is only imported and made when first used
+    if not _profiler:
+        from chaoshmup.profiler import FrameProfiler
+        _profiler.append(FrameProfiler(schedule=schedule))
+    return _profiler[0]
+
+def profile_action(schedule):
+    def action():
+        frame_profiler(schedule).capture()
+    return action
+
 def screenshot_action(screen):
     def action():
-        scrnums = [int(x[len("screenshot_"):-len(".png")])
-                   for x in os.listdir(os.getcwd())
-                   if x.startswith("screenshot_") and x.endswith(".png")]
-        if scrnums:
-            highest = max(scrnums)
-        else:
-            highest = 0
-        newfilename = "screenshot_%d.png" % (highest+1)
-        print "Taking screenshot and saving as %s" % newfilename
-        pygame.image.save(screen,newfilename)
+        capture().screenshot(screen)
     return action
 
-def main():
+def recording_action():
+    capture().toggle_recording()
+
+def main(args=None):
+    if args is None:
+        args = sys.argv[1:]
+    timer = StartupTimer()
+    timer.mark("imports")
+
     # Initialise modules
     print "Initialising"
-    screen = initialise()
+    screen = initialise(timer, "--vsync" in args)
 
     # Generate world
     print "Generating world"
-    w = generate_world()
+    w = generate_world(load_level())
+    timer.mark("world")
 
     # Set up controllers
     print "Setting up controls"
@@ -110,48 +213,94 @@ def main():
     action_map[K_LSHIFT] = controllers["Player 2"].input_actions[5]
 
     action_map[K_F12] = InputAction("Take Screenshot",screenshot_action(screen),None)
+    action_map[K_F11] = InputAction("Toggle Recording",recording_action,None)
+    action_map[K_F10] = InputAction("Profile Frames",profile_action(w.schedule),None)
+    timer.mark("controls")
 
     # Game loop
     print "Starting game loop"
-    clock = pygame.time.Clock()
-    font = pygame.font.Font(None, 24)
-    fpsrect = pygame.Rect(0,0,0,0)
-    delta = 0.0
-
-    playing = True
-    while playing:
-        # Draw screen
-        w.draw(screen)
-        screen.fill((0,0,0),fpsrect)
-        fps = font.render("FPS: %.2f" % (clock.get_fps()), 1, (255, 255, 255))
-        fpsrect = fps.get_rect()
-        screen.blit(fps, fpsrect)
+    pacer = FramePacer(FRAMERATE, "--low-latency" in args, "--vsync" in args)
+    hud = HUD(pygame.font.Font(None, 24))
+    hud.field("fps", (0, 0), "FPS: %.2f")
 
-        pygame.display.flip()
+    state = {"playing": True, "first frame": True}
+    idle = NoProfiler()
+    def frame(delta):
+        profiler = _profiler[0] if _profiler else idle
+        profiler.frame_start()
 
         # Handle events
         for event in pygame.event.get():
             if event.type == KEYDOWN:
                 # Escape key is magic, bypasses normal input handling
                 if event.key == K_ESCAPE:
-                    playing = False
+                    state["playing"] = False
                 elif event.key in action_map and action_map[event.key].down_func:
                     action_map[event.key].down_func()
             elif event.type == KEYUP:
                 if event.key in action_map and action_map[event.key].up_func:
                     action_map[event.key].up_func()
+        if not state["playing"]:
+            return False
+        profiler.mark("events")
 
         # Update world
-        delta_ms = clock.tick(FRAMERATE)
-        delta = delta_ms / 1000.0
         w.update(delta)
+        profiler.mark("update")
+
+        makeup(w)
+        profiler.mark("spawn")
+
+        # Draw screen
+        w.draw(screen)
+        hud.set("fps", pacer.fps())
+        hud.draw(screen)
+        profiler.pause("draw")
+        return True
+
+    def flip():
+        profiler = _profiler[0] if _profiler else idle
+        profiler.mark("wait")
+        pygame.display.flip()
+        if _capture:
+            _capture[0].frame(screen)
+        profiler.mark("present")
+        profiler.frame_end()
+        if state["first frame"]:
+            timer.mark("first frame")
+            print timer.report()
+            state["first frame"] = False
+            if "--first-frame" in args:
+                state["playing"] = False
 
-        # Makeup enemy numbers - this is really only temporary
-        makeup = 15 - (len(w.enemies) + len(w.explosions))
-        if makeup > 0:
-            for i in range(makeup):
-                w.enemies.add(random_enemy(w))
+    if "--host" in args:
+        # Run the frame loop as a task so other tasks can share the process
+        from chaoshmup.host import Host, frames
+        host = Host()
+        host.run(frames(host, pacer, frame, flip))
+    else:
+        while frame(pacer.frame_start()):
+            pacer.present(flip)
 
     # Quit game
+    print pacer.report()
+    print w.schedule.report()
+    print hud.report()
+    if _profiler:
+        _profiler[0].close()
+        print _profiler[0].report()
+    print w.particles.report()
+    print w.renderer.report()
+    print w.camera.report()
+    print w.tints.report()
+    print w.transforms.report()
+    print w.events.report()
+    if w.masks:
+        print w.masks.report()
+    print w.level.report()
+    w.level.close()
+    if _capture:
+        _capture[0].close()
+        print _capture[0].report()
     print "Quitting"
     pygame.quit()
@@ -0,0 +1,150 @@
+# Copyright (c) 2010, Morgan Lokhorst-Blight 
+# All rights reserved. 
+# 
+# Redistribution and use in source and binary forms, with or without 
+# modification, are permitted provided that the following conditions are met: 
+# 
+#  * Redistributions of source code must retain the above copyright notice, 
+#    this list of conditions and the following disclaimer. 
+#  * Redistributions in binary form must reproduce the above copyright 
+#    notice, this list of conditions and the following disclaimer in the 
+#    documentation and/or other materials provided with the distribution. 
+# 
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR AND CONTRIBUTORS ``AS IS'' AND ANY 
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED 
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE 
+# DISCLAIMED. IN NO EVENT SHALL THE AUTHOR OR CONTRIBUTORS BE LIABLE FOR ANY 
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES 
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR 
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER 
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT 
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY 
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH 
+# DAMAGE. 
+
+import heapq
+import select
+from collections import deque
+from timeit import default_timer
+
+# Python 2 has no asyncio, so this is a small cooperative host in the same
+# spirit: tasks are generators that yield what they are waiting for, and the
+# host multiplexes them with select(). The frame loop runs as one task and
+# other tasks (sockets, file writers, telemetry) share the process between
+# frames.
+#
+# Tasks yield one of:
+#   None                  run again after other ready tasks
+#   host.until(t)         resume at default_timer() time t
+#   host.sleep(seconds)   resume after a delay
+#   host.readable(f)      resume when f (anything with fileno()) is readable
+#   host.writable(f)      resume when f is writable
+#
+# Background work is only dispatched while the next timed wake-up is more
+# than SLICE seconds away, so a task that yields often can never push a
+# frame past its deadline.
+class Host(object):
+    SLICE = 0.002
+    def __init__(self, slice=None):
+        self.slice = slice or self.SLICE
+        self.ready = deque()
+        self.timers = []
+        self.readers = {}
+        self.writers = {}
+        self.sequence = 0
+        self.tasks = 0
+        self.steps = 0
+
+    def until(self, t):
+        return ("until", t)
+
+    def sleep(self, seconds):
+        return ("until", default_timer() + seconds)
+
+    def readable(self, f):
+        return ("read", f)
+
+    def writable(self, f):
+        return ("write", f)
+
+    def spawn(self, task):
+        self.tasks += 1
+        self.ready.append(task)
+        return task
+
+    def schedule(self, task, request):
+        if request is None:
+            self.ready.append(task)
+        elif request[0] == "until":
+            self.sequence += 1
+            heapq.heappush(self.timers, (request[1], self.sequence, task))
+        elif request[0] == "read":
+            self.readers[request[1].fileno()] = task
+        elif request[0] == "write":
+            self.writers[request[1].fileno()] = task
+        else:
+            raise ValueError("Unknown request %r" % (request,))
+
+    def step(self, task):
+        self.steps += 1
+        try:
+            request = task.next()
+        except StopIteration:
+            self.tasks -= 1
+            return False
+        self.schedule(task, request)
+        return True
+
+    # Runs until main (a task) finishes; other tasks are abandoned then.
+    def run(self, main):
+        done = []
+        def watch():
+            for request in main:
+                yield request
+            done.append(True)
+        self.spawn(watch())
+        while not done:
+            now = default_timer()
+            while self.timers and self.timers[0][0] <= now:
+                self.step(heapq.heappop(self.timers)[2])
+                if done:
+                    return
+                now = default_timer()
+            # Background slice: stop before the next timer gets close
+            for i in range(len(self.ready)):
+                if self.timers and self.timers[0][0] - default_timer() < self.slice:
+                    break
+                self.step(self.ready.popleft())
+                if done:
+                    return
+            if self.ready:
+                timeout = 0
+            elif self.timers:
+                timeout = max(0, self.timers[0][0] - default_timer())
+            else:
+                timeout = None
+            if self.readers or self.writers:
+                (r, w, x) = select.select(self.readers.keys(), self.writers.keys(), [], timeout)
+                for fd in r:
+                    self.ready.append(self.readers.pop(fd))
+                for fd in w:
+                    self.ready.append(self.writers.pop(fd))
+            elif timeout:
+                select.select([], [], [], timeout)
+
+# The frame loop as a task: frame(delta) runs one frame and returns False to
+# stop, flip shows it. Waits are yielded to the host until just short of the
+# pacer's deadlines; the pacer spins the rest so frames stay on time.
+def frames(host, pacer, frame, flip):
+    while True:
+        t = pacer.start_time()
+        if t is not None:
+            yield host.until(t - pacer.SPIN)
+        if not frame(pacer.frame_start()):
+            return
+        t = pacer.present_time()
+        if t is not None:
+            yield host.until(t - pacer.SPIN)
+        else:
+            yield None
+        pacer.present(flip)
@@ -0,0 +1,125 @@
+# Copyright (c) 2010, Morgan Lokhorst-Blight 
+# All rights reserved. 
+# 
+# Redistribution and use in source and binary forms, with or without 
+# modification, are permitted provided that the following conditions are met: 
+# 
+#  * Redistributions of source code must retain the above copyright notice, 
+#    this list of conditions and the following disclaimer. 
+#  * Redistributions in binary form must reproduce the above copyright 
+#    notice, this list of conditions and the following disclaimer in the 
+#    documentation and/or other materials provided with the distribution. 
+# 
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR AND CONTRIBUTORS ``AS IS'' AND ANY 
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED 
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE 
+# DISCLAIMED. IN NO EVENT SHALL THE AUTHOR OR CONTRIBUTORS BE LIABLE FOR ANY 
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES 
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR 
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER 
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT 
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY 
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH 
+# DAMAGE. 
+
+import string
+
+import pygame
+from pygame.locals import *
+
+# HUD text without rasterising a string every frame. Each glyph of a font is
+# rendered once into an atlas; a field's text is laid out as a run of atlas
+# glyph blits only when its text changes, and drawing the HUD is one batched
+# blit of every field's glyphs straight to the target.
+class GlyphAtlas(object):
+    CHARSET = string.digits + string.letters + string.punctuation + " "
+    def __init__(self, font, colour, antialias=True, charset=None):
+        self.font = font
+        self.colour = colour
+        self.antialias = antialias
+        self.height = font.get_linesize()
+        self.glyphs = {}
+        charset = charset or self.CHARSET
+        rendered = [(c, font.render(c, antialias, colour)) for c in charset]
+        width = sum(image.get_width() for (c, image) in rendered)
+        self.surface = pygame.Surface((max(1, width), self.height), SRCALPHA, 32)
+        x = 0
+        for (c, image) in rendered:
+            self.surface.blit(image, (x, 0))
+            self.add(c, self.surface, pygame.Rect(x, 0, image.get_width(), image.get_height()))
+            x += image.get_width()
+        self.misses = 0
+
+    def add(self, c, surface, area):
+        metrics = self.font.metrics(c)[0]
+        advance = metrics[4] if metrics else area.width
+        self.glyphs[c] = (surface, area, advance)
+
+    def glyph(self, c):
+        g = self.glyphs.get(c)
+        if g is None:
+            # Characters outside the charset get a surface of their own
+            self.misses += 1
+            image = self.font.render(c, self.antialias, self.colour)
+            self.add(c, image, image.get_rect())
+            g = self.glyphs[c]
+        return g
+
+    # Appends blits drawing text at pos to seq and returns the x where the
+    # text ends
+    def layout(self, text, pos, seq):
+        (x, y) = pos
+        glyphs = self.glyphs
+        append = seq.append
+        for c in text:
+            g = glyphs.get(c) or self.glyph(c)
+            append((g[0], (x, y), g[1]))
+            x += g[2]
+        return x
+
+class HUD(object):
+    def __init__(self, font, colour=(255, 255, 255), antialias=True):
+        self.atlas = GlyphAtlas(font, colour, antialias)
+        self.fields = {}
+        self.order = []
+        self.blits = None
+        self.composed = 0
+        self.skipped = 0
+
+    # The literal text before the first conversion in fmt never changes, so
+    # its glyphs are laid out once; set() only lays out the rest
+    def field(self, name, pos, fmt="%s"):
+        label = fmt.split("%", 1)[0]
+        seq = []
+        end = self.atlas.layout(label, pos, seq)
+        self.fields[name] = {"fmt": fmt, "text": None, "skip": len(label), "label": seq,
+                             "pos": (end, pos[1]), "seq": []}
+        self.order.append(name)
+        self.blits = None
+
+    def set(self, name, *values):
+        f = self.fields[name]
+        text = f["fmt"] % values
+        if text == f["text"]:
+            self.skipped += 1
+            return
+        f["text"] = text
+        seq = f["seq"] = []
+        self.atlas.layout(text[f["skip"]:], f["pos"], seq)
+        self.blits = None
+        self.composed += 1
+
+    def draw(self, surface):
+        if self.blits is None:
+            blits = self.blits = []
+            for name in self.order:
+                f = self.fields[name]
+                if f["text"] is not None:
+                    blits.extend(f["label"])
+                    blits.extend(f["seq"])
+        surface.blits(self.blits, False)
+
+    def report(self):
+        total = max(1, self.composed + self.skipped)
+        return "HUD: %d fields, %d composed, %.1f%% unchanged, %d glyphs outside the atlas" % (
+            len(self.order), self.composed, self.skipped * 100.0 / total, self.atlas.misses)
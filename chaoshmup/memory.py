@@ -0,0 +1,88 @@
+# Copyright (c) 2010, Morgan Lokhorst-Blight 
+# All rights reserved. 
+# 
+# Redistribution and use in source and binary forms, with or without 
+# modification, are permitted provided that the following conditions are met: 
+# 
+#  * Redistributions of source code must retain the above copyright notice, 
+#    this list of conditions and the following disclaimer. 
+#  * Redistributions in binary form must reproduce the above copyright 
+#    notice, this list of conditions and the following disclaimer in the 
+#    documentation and/or other materials provided with the distribution. 
+# 
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR AND CONTRIBUTORS ``AS IS'' AND ANY 
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED 
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE 
+# DISCLAIMED. IN NO EVENT SHALL THE AUTHOR OR CONTRIBUTORS BE LIABLE FOR ANY 
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES 
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR 
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER 
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT 
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY 
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH 
+# DAMAGE. 
+
+import gc
+import sys
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+def surface_bytes(surface, shared):
+    # Pixel data is only charged to the entity if it owns the surface
+    if surface is None or id(surface) in shared or surface.get_parent() is not None:
+        return 0
+    return surface.get_pitch() * surface.get_height()
+
+def instance_bytes(obj):
+    size = sys.getsizeof(obj)
+    d = getattr(obj, "__dict__", None)
+    if d:
+        size += sys.getsizeof(d)
+    for cls in type(obj).__mro__:
+        for name in cls.__dict__.get("__slots__", ()):
+            value = getattr(obj, name, None)
+            if isinstance(value, (dict, list, float)):
+                size += sys.getsizeof(value)
+    return size
+
+# Bytes per live entity by class: the Python objects each entity owns
+# (instance, group dict, rect) plus pixels of images it doesn't share.
+def entity_sizes(world):
+    shared = set()
+    for g in world.layers:
+        for s in g:
+            shared.update(id(i) for i in type(s).images)
+    sizes = {}
+    for g in world.layers:
+        for s in g:
+            (count, objects, pixels) = sizes.get(type(s).__name__, (0, 0, 0))
+            sizes[type(s).__name__] = (count + 1,
+                                       objects + instance_bytes(s) + sys.getsizeof(s.rect),
+                                       pixels + surface_bytes(s.image, shared))
+    return sizes
+
+# Bytes allocated per object by factory(), measured with tracemalloc where
+# the interpreter provides it.
+def traced_bytes(factory, count=1000):
+    if tracemalloc is None:
+        return None
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        objects = [factory() for i in range(count)]
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    del objects
+    return (after - before) / float(count)
+
+def report(world):
+    lines = ["%-12s %7s %10s %10s %10s" % ("class", "count", "objects", "pixels", "per entity")]
+    for (name, (count, objects, pixels)) in sorted(entity_sizes(world).iteritems()):
+        lines.append("%-12s %7d %10d %10d %10.0f" % (name, count, objects, pixels,
+                                                     (objects + pixels) / float(count)))
+    return "\n".join(lines)
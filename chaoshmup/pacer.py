@@ -0,0 +1,158 @@
+# Copyright (c) 2010, Morgan Lokhorst-Blight 
+# All rights reserved. 
+# 
+# Redistribution and use in source and binary forms, with or without 
+# modification, are permitted provided that the following conditions are met: 
+# 
+#  * Redistributions of source code must retain the above copyright notice, 
+#    this list of conditions and the following disclaimer. 
+#  * Redistributions in binary form must reproduce the above copyright 
+#    notice, this list of conditions and the following disclaimer in the 
+#    documentation and/or other materials provided with the distribution. 
+# 
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR AND CONTRIBUTORS ``AS IS'' AND ANY 
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED 
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE 
+# DISCLAIMED. IN NO EVENT SHALL THE AUTHOR OR CONTRIBUTORS BE LIABLE FOR ANY 
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES 
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR 
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER 
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT 
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY 
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH 
+# DAMAGE. 
+
+import time
+from array import array
+from timeit import default_timer
+
+# Paces frames to a fixed rate more evenly than pygame.time.Clock: it sleeps
+# until just short of each deadline and spins for the rest, and schedules
+# deadlines from the previous one rather than from whenever the frame ended.
+#
+# Call frame_start() before handling input and present(flip) instead of
+# flipping directly. In low latency mode the sleep happens in frame_start(),
+# timed so the frame's work (estimated from recent frames) finishes just as
+# its deadline arrives (with a margin for how much the work varies);
+# otherwise the work runs immediately and present() waits. With vsync the
+# display's flip is trusted to block instead, until FAST_FLIPS frames in a
+# row come in well under the period (a windowed SDL1 display often has no
+# vsync at all); then it goes back to pacing the frames itself.
+class FramePacer(object):
+    SPIN = 0.002
+    HISTORY = 600
+    WORK_SMOOTHING = 0.1
+    FAST_FLIPS = 30
+    def __init__(self, framerate, low_latency=False, vsync=False):
+        self.period = 1.0 / framerate
+        self.low_latency = low_latency
+        self.vsync = vsync
+        self.fast_flips = 0
+        self.vsync_failed = False
+        self.deadline = None
+        self.last_present = None
+        self.delta = self.period
+        self.work_start = 0.0
+        self.work = 0.0
+        self.work_dev = 0.0
+        self.intervals = array("d")
+        self.next = 0
+        self.late = 0
+        self.frames = 0
+
+    def sleep_until(self, t):
+        remaining = t - default_timer()
+        if remaining > self.SPIN:
+            time.sleep(remaining - self.SPIN)
+        while default_timer() < t:
+            pass
+
+    # When frame_start() and present() would next start waiting (None if they
+    # won't), so a host can hand that time to other tasks first
+    def start_time(self):
+        if self.deadline is None or not self.low_latency or self.vsync:
+            return None
+        return self.deadline - self.work - 2 * self.work_dev
+
+    def present_time(self):
+        if self.deadline is None or self.vsync:
+            return None
+        return self.deadline
+
+    def frame_start(self):
+        if self.deadline is None:
+            self.deadline = default_timer()
+        elif self.low_latency and not self.vsync:
+            self.sleep_until(self.deadline - self.work - 2 * self.work_dev)
+        self.work_start = default_timer()
+        return self.delta
+
+    def present(self, flip):
+        work = default_timer() - self.work_start
+        self.work_dev += (abs(work - self.work) - self.work_dev) * self.WORK_SMOOTHING
+        self.work += (work - self.work) * self.WORK_SMOOTHING
+        if not self.vsync:
+            self.sleep_until(self.deadline)
+        flip()
+        now = default_timer()
+        if self.last_present is not None:
+            self.record(now - self.last_present)
+            self.delta = now - self.last_present
+            if self.vsync and not self.check_vsync(self.delta):
+                # The deadlines ran ahead of the unsynchronised flips
+                self.deadline = now
+        self.last_present = now
+        self.deadline += self.period
+        if now > self.deadline:
+            # Missed a whole frame; resynchronise rather than rushing to catch up
+            self.deadline = now + self.period
+
+    # Whether the flip can still be trusted to pace the frames
+    def check_vsync(self, interval):
+        if interval >= self.period * 0.9:
+            self.fast_flips = 0
+            return True
+        self.fast_flips += 1
+        if self.fast_flips >= self.FAST_FLIPS:
+            self.vsync = False
+            self.vsync_failed = True
+            print "Display flips are not synchronised, pacing frames instead"
+        return self.vsync
+
+    def record(self, interval):
+        self.frames += 1
+        if interval > self.period * 1.5:
+            self.late += 1
+        if len(self.intervals) < self.HISTORY:
+            self.intervals.append(interval)
+        else:
+            self.intervals[self.next] = interval
+            self.next = (self.next + 1) % self.HISTORY
+
+    def fps(self):
+        if not self.intervals:
+            return 0.0
+        return len(self.intervals) / sum(self.intervals)
+
+    def percentile(self, p, ordered=None):
+        if ordered is None:
+            ordered = sorted(self.intervals)
+        if not ordered:
+            return 0.0
+        return ordered[min(len(ordered) - 1, int(p / 100.0 * len(ordered)))]
+
+    def stats(self):
+        ordered = sorted(self.intervals)
+        s = {"frames": self.frames, "late": self.late,
+             "target_ms": self.period * 1000.0, "work_ms": self.work * 1000.0,
+             "vsync_failed": self.vsync_failed}
+        for p in (50, 90, 99):
+            s["p%d_ms" % p] = self.percentile(p, ordered) * 1000.0
+        s["max_ms"] = (ordered[-1] if ordered else 0.0) * 1000.0
+        s["jitter_ms"] = s["p99_ms"] - s["p50_ms"]
+        return s
+
+    def report(self):
+        return ("Pacing: target %(target_ms).2fms, p50 %(p50_ms).2fms, p90 %(p90_ms).2fms, "
+                "p99 %(p99_ms).2fms, max %(max_ms).2fms, jitter %(jitter_ms).2fms, "
+                "%(late)d late of %(frames)d frames, work %(work_ms).2fms" % self.stats())
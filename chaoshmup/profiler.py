@@ -0,0 +1,190 @@
+# Copyright (c) 2010, Morgan Lokhorst-Blight 
+# All rights reserved. 
+# 
+# Redistribution and use in source and binary forms, with or without 
+# modification, are permitted provided that the following conditions are met: 
+# 
+#  * Redistributions of source code must retain the above copyright notice, 
+#    this list of conditions and the following disclaimer. 
+#  * Redistributions in binary form must reproduce the above copyright 
+#    notice, this list of conditions and the following disclaimer in the 
+#    documentation and/or other materials provided with the distribution. 
+# 
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR AND CONTRIBUTORS ``AS IS'' AND ANY 
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED 
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE 
+# DISCLAIMED. IN NO EVENT SHALL THE AUTHOR OR CONTRIBUTORS BE LIABLE FOR ANY 
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES 
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR 
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER 
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT 
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY 
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH 
+# DAMAGE. 
+
+import cProfile
+import os
+import pstats
+import threading
+from timeit import default_timer
+
+# Profiles the next FRAMES frames on request, so a frame drop can be caught
+# in a running game. cProfile is only enabled for the capture window. The
+# main loop calls frame_start(), mark(phase) after each phase and frame_end();
+# these do nothing outside a capture. When the window closes the results are
+# written to profile_N.txt (phases per frame, the slowest frames, systems and
+# the hottest functions) and profile_N.prof (for pstats or other viewers) on
+# a writer thread, off the frame path. close() finishes a capture cut short
+# by quitting and waits for the writer.
+class FrameProfiler(object):
+    FRAMES = 120
+    TOP = 30
+    SLOWEST = 10
+    def __init__(self, directory=None, frames=None, schedule=None):
+        self.directory = directory or os.getcwd()
+        self.frames = frames or self.FRAMES
+        self.schedule = schedule
+        self.armed = False
+        self.active = False
+        self.paused = False
+        self.profile = None
+        self.records = []
+        self.current = None
+        self.last = 0.0
+        self.first = 0
+        self.count = 0
+        self.systems = None
+        self.written = []
+        self.writer = None
+
+    # A capture asked for while the last one is still being written starts
+    # once the writer is done
+    def capture(self):
+        if not self.active:
+            self.armed = True
+
+    def writing(self):
+        return self.writer is not None and self.writer.is_alive()
+
+    def system_times(self):
+        return dict((type(e["system"]).__name__, e["time"]) for e in self.schedule.entries)
+
+    def frame_start(self):
+        self.count += 1
+        if self.armed and not self.writing():
+            self.armed = False
+            self.active = True
+            self.records = []
+            self.first = self.count
+            if self.schedule:
+                self.systems = self.system_times()
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+        if self.active:
+            self.current = []
+            self.last = default_timer()
+
+    def mark(self, phase):
+        if self.active:
+            now = default_timer()
+            self.current.append((phase, now - self.last))
+            self.last = now
+            if self.paused:
+                self.paused = False
+                self.profile.enable()
+
+    # Like mark(), but the time until the next mark is left out of the
+    # function profile; the pacer's wait would otherwise top it
+    def pause(self, phase):
+        if self.active:
+            self.mark(phase)
+            self.profile.disable()
+            self.paused = True
+
+    def frame_end(self):
+        if not self.active:
+            return
+        self.records.append(self.current)
+        if len(self.records) >= self.frames:
+            self.finish(threaded=True)
+
+    # Stops the capture and writes what it holds, on the writer thread when
+    # threaded; the records and profile are handed over, so the next capture
+    # starts clean
+    def finish(self, threaded):
+        self.profile.disable()
+        self.active = False
+        self.paused = False
+        systems = None
+        if self.systems is not None:
+            now = self.system_times()
+            systems = [(system, t - self.systems[system]) for (system, t) in now.items()]
+        job = (self.records, self.first, systems, self.profile)
+        self.records = []
+        self.profile = None
+        if threaded:
+            self.writer = threading.Thread(target=self.write, args=job, name="profiler")
+            self.writer.start()
+        else:
+            self.write(*job)
+
+    def close(self):
+        if self.active:
+            if self.records:
+                self.finish(threaded=False)
+            else:
+                self.profile.disable()
+                self.active = False
+        self.armed = False
+        if self.writer is not None:
+            self.writer.join()
+
+    def next_name(self):
+        nums = [x[len("profile_"):-len(".txt")] for x in os.listdir(self.directory)
+                if x.startswith("profile_") and x.endswith(".txt")]
+        nums = [int(n) for n in nums if n.isdigit()]
+        return os.path.join(self.directory, "profile_%d" % (max(nums or [0]) + 1))
+
+    def write(self, records, first, systems, profile):
+        name = self.next_name()
+        frames = len(records)
+        totals = [sum(t for (phase, t) in r) for r in records]
+        phases = []
+        times = {}
+        for r in records:
+            for (phase, t) in r:
+                if phase not in times:
+                    phases.append(phase)
+                    times[phase] = []
+                times[phase].append(t)
+        whole = sum(totals) or 1.0
+        f = open(name + ".txt", "w")
+        f.write("Frames %d-%d: %d frames, mean %.2fms, worst %.2fms\n\n" % (
+            first, first + frames - 1, frames,
+            whole / frames * 1000.0, max(totals) * 1000.0))
+        f.write("%-16s %9s %9s %7s\n" % ("Phase", "mean", "max", "share"))
+        for phase in phases:
+            t = times[phase]
+            f.write("%-16s %7.2fms %7.2fms %6.1f%%\n" % (
+                phase, sum(t) / frames * 1000.0, max(t) * 1000.0, sum(t) / whole * 100.0))
+        if systems is not None:
+            f.write("\n%-16s %9s\n" % ("System", "mean"))
+            for (system, t) in sorted(systems, key=lambda (s, t): -t):
+                f.write("%-16s %7.2fms\n" % (system, t / frames * 1000.0))
+        f.write("\nSlowest frames\n")
+        slowest = sorted(range(frames), key=lambda i: -totals[i])[:self.SLOWEST]
+        for i in slowest:
+            f.write("  frame %-6d %7.2fms  %s\n" % (first + i, totals[i] * 1000.0, "  ".join(
+                "%s %.2f" % (phase, t * 1000.0) for (phase, t) in records[i])))
+        for (order, title) in (("tottime", "own time"), ("cumulative", "cumulative time")):
+            f.write("\nHottest functions by %s\n" % title)
+            stats = pstats.Stats(profile, stream=f)
+            stats.strip_dirs().sort_stats(order).print_stats(self.TOP)
+        f.close()
+        profile.dump_stats(name + ".prof")
+        self.written.append(name + ".txt")
+        print "Profiled %d frames to %s" % (frames, name + ".txt")
+
+    def report(self):
+        return "Profiler: %d captures%s" % (len(self.written), "".join(
+            "\n  " + name for name in self.written))
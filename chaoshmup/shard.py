@@ -0,0 +1,362 @@
+# Copyright (c) 2010, Morgan Lokhorst-Blight 
+# All rights reserved. 
+# 
+# Redistribution and use in source and binary forms, with or without 
+# modification, are permitted provided that the following conditions are met: 
+# 
+#  * Redistributions of source code must retain the above copyright notice, 
+#    this list of conditions and the following disclaimer. 
+#  * Redistributions in binary form must reproduce the above copyright 
+#    notice, this list of conditions and the following disclaimer in the 
+#    documentation and/or other materials provided with the distribution. 
+# 
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR AND CONTRIBUTORS ``AS IS'' AND ANY 
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED 
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE 
+# DISCLAIMED. IN NO EVENT SHALL THE AUTHOR OR CONTRIBUTORS BE LIABLE FOR ANY 
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES 
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR 
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER 
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT 
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY 
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH 
+# DAMAGE. 
+
+import multiprocessing
+import time
+
+import numpy
+
+from chaoshmup.world.ship import Ship
+from chaoshmup.world.weapons import LaserBolt, PlasmaBall, LaserRepeater, PlasmaRepeater
+
+# Large arenas split into vertical strips, each simulated by its own worker
+# process. The entities here are plain rows of numbers rather than World
+# sprites so they can cross process boundaries cheaply; the main process only
+# routes border traffic and draws what the workers publish.
+#
+# Each tick has two phases. In the first every worker moves its entities and
+# returns the rows that left its strip (migrants) and copies of the rows
+# within MARGIN of its edges (ghosts). The main process passes these to the
+# neighbours, and in the second phase workers adopt their migrants and test
+# collisions against their own rows and the ghosts. A worker keeps its own
+# outgoing migrants as ghosts for that test, so a shot crossing a border
+# this tick can still hit the ship it left behind. A worker only changes its
+# own rows, and both sides of a border see the same rows, so a hit across a
+# border is resolved identically on each side. Each worker then writes
+# position, heading and kind for its rows into a shared array for drawing.
+#
+# Enemies fire like a PlasmaRepeater and players like a LaserRepeater, with
+# the damage and speed of those weapons' projectiles.
+
+# Row layout
+(X, Y, VX, VY, HEADING, KIND, HEALTH, COOLDOWN, AGE) = range(9)
+FIELDS = 9
+
+# Kinds: enemy ship, player ship, laser bolt, plasma ball
+(ENEMY, PLAYER, BOLT, PLASMA) = range(4)
+TEAMS = numpy.array([0, 1, 1, 0])
+DAMAGE = numpy.array([0.0, 0.0, LaserBolt.DAMAGE, PlasmaBall.DAMAGE], numpy.float64)
+SHOT_SPEED = numpy.array([PlasmaBall.MAX_VEL, -LaserBolt.MAX_VEL], numpy.float64)
+SHOT_KIND = numpy.array([PLASMA, BOLT])
+# Seconds between shots, by ship kind
+RATE_OF_FIRE = numpy.array([PlasmaRepeater.RATE_OF_FIRE, LaserRepeater.RATE_OF_FIRE])
+
+SHIP_SPEED = 60.0
+SHIP_HEALTH = float(Ship.HEALTH)
+PROJECTILE_LIFETIME = 1.0
+RADIUS = 12.0
+MARGIN = RADIUS
+RENDER_FIELDS = 4
+
+def random_ships(count, area, random, players=0.1):
+    (x0, x1, height) = area
+    rows = numpy.zeros((count, FIELDS))
+    rows[:, X] = random.uniform(x0, x1, count)
+    rows[:, Y] = random.uniform(0, height, count)
+    angle = random.uniform(0, 2 * numpy.pi, count)
+    rows[:, VX] = numpy.cos(angle) * SHIP_SPEED
+    rows[:, VY] = numpy.sin(angle) * SHIP_SPEED
+    rows[:, KIND] = numpy.where(random.uniform(0, 1, count) < players, PLAYER, ENEMY)
+    rows[:, HEADING] = numpy.where(rows[:, KIND] == PLAYER, 0.0, 180.0)
+    rows[:, HEALTH] = SHIP_HEALTH
+    rows[:, COOLDOWN] = random.uniform(0, 1, count) * \
+        RATE_OF_FIRE[rows[:, KIND].astype(numpy.intp)]
+    return rows
+
+# Index pairs (a, b) of points in a and b closer than radius, by binning b
+# into a grid of radius-sized cells and searching the 3x3 cells around each
+# point in a
+def close_pairs(a, b, radius):
+    empty = numpy.zeros(0, numpy.intp)
+    if not len(a) or not len(b):
+        return (empty, empty)
+    ax = numpy.floor(a[:, 0] / radius).astype(numpy.int64)
+    ay = numpy.floor(a[:, 1] / radius).astype(numpy.int64)
+    bkey = (numpy.floor(b[:, 0] / radius).astype(numpy.int64) << 32) + \
+        numpy.floor(b[:, 1] / radius).astype(numpy.int64)
+    order = numpy.argsort(bkey)
+    sorted_keys = bkey[order]
+    found_a = []
+    found_b = []
+    for dx in (-1, 0, 1):
+        for dy in (-1, 0, 1):
+            key = ((ax + dx) << 32) + (ay + dy)
+            lo = numpy.searchsorted(sorted_keys, key, "left")
+            n = numpy.searchsorted(sorted_keys, key, "right") - lo
+            total = n.sum()
+            if not total:
+                continue
+            ia = numpy.repeat(numpy.arange(len(a)), n)
+            offsets = numpy.arange(total) - numpy.repeat(numpy.cumsum(n) - n, n)
+            ib = order[numpy.repeat(lo, n) + offsets]
+            d = a[ia] - b[ib]
+            close = (d * d).sum(axis=1) < radius * radius
+            found_a.append(ia[close])
+            found_b.append(ib[close])
+    if not found_a:
+        return (empty, empty)
+    return (numpy.concatenate(found_a), numpy.concatenate(found_b))
+
+# Dead ships come back elsewhere in the strip when respawn is set, so the
+# load stays steady; without it they are removed, and the state for a given
+# seed is the same however many workers share the arena
+class Region(object):
+    def __init__(self, index, x0, x1, arena, seed, respawn=True):
+        self.index = index
+        self.x0 = x0
+        self.x1 = x1
+        (self.width, self.height) = arena
+        self.random = numpy.random.RandomState(seed)
+        self.respawn = respawn
+        # Only sides with a neighbouring strip hand rows off; the arena walls
+        # keep everything else in
+        self.neighbours = (x0 > 0, x1 < self.width)
+        self.rows = numpy.zeros((0, FIELDS))
+        self.leaving = self.rows
+        self.kills = 0
+
+    def move(self, delta):
+        rows = self.rows
+        rows[:, X] += rows[:, VX] * delta
+        rows[:, Y] += rows[:, VY] * delta
+        rows[:, AGE] += delta
+        ships = rows[:, KIND] < BOLT
+        # Ships bounce off the arena edges
+        for (axis, v, limit) in ((X, VX, self.width), (Y, VY, self.height)):
+            out = ships & ((rows[:, axis] < 0) | (rows[:, axis] > limit))
+            rows[out, v] *= -1
+            rows[out, axis] = numpy.clip(rows[out, axis], 0, limit)
+        rows[ships, COOLDOWN] -= delta
+        firing = ships & (rows[:, COOLDOWN] <= 0)
+        shooters = rows[firing]
+        rows[firing, COOLDOWN] += RATE_OF_FIRE[rows[firing, KIND].astype(numpy.intp)]
+        expired = ~ships & ((rows[:, AGE] > PROJECTILE_LIFETIME) |
+                            (rows[:, Y] < 0) | (rows[:, Y] > self.height))
+        rows = rows[~expired]
+        if len(shooters):
+            team = TEAMS[shooters[:, KIND].astype(numpy.intp)]
+            shots = numpy.zeros((len(shooters), FIELDS))
+            shots[:, X] = shooters[:, X]
+            shots[:, Y] = shooters[:, Y]
+            shots[:, VY] = SHOT_SPEED[1 - team]
+            shots[:, HEADING] = shooters[:, HEADING]
+            shots[:, KIND] = SHOT_KIND[1 - team]
+            rows = numpy.concatenate((rows, shots))
+        # Hand off rows that left the strip and ghost those near its edges
+        left = (rows[:, X] < self.x0) & self.neighbours[0]
+        right = (rows[:, X] >= self.x1) & self.neighbours[1]
+        migrants = (rows[left], rows[right])
+        self.leaving = numpy.concatenate(migrants)
+        self.rows = rows = rows[~(left | right)]
+        ghosts = (rows[rows[:, X] < self.x0 + MARGIN],
+                  rows[rows[:, X] >= self.x1 - MARGIN])
+        return (numpy.concatenate((migrants[0], ghosts[0])), len(migrants[0]),
+                numpy.concatenate((migrants[1], ghosts[1])), len(migrants[1]))
+
+    def collide(self, incoming):
+        ghosts = [self.rows, self.leaving]
+        for (rows, migrants) in incoming:
+            self.rows = numpy.concatenate((self.rows, rows[:migrants]))
+            ghosts.append(rows[migrants:])
+        own = len(self.rows)
+        every = numpy.concatenate([self.rows] + ghosts[1:])
+        ships = numpy.nonzero(every[:, KIND] < BOLT)[0]
+        shots = numpy.nonzero(every[:, KIND] >= BOLT)[0]
+        (si, pi) = close_pairs(every[ships, X:Y + 1], every[shots, X:Y + 1], RADIUS)
+        (si, pi) = (ships[si], shots[pi])
+        kinds = every[:, KIND].astype(numpy.intp)
+        hostile = TEAMS[kinds[si]] != TEAMS[kinds[pi]]
+        (si, pi) = (si[hostile], pi[hostile])
+        rows = self.rows
+        mine = si < own
+        numpy.subtract.at(rows[:, HEALTH], si[mine], DAMAGE[kinds[pi[mine]]])
+        spent = numpy.zeros(own, numpy.bool_)
+        spent[pi[pi < own]] = True
+        dead = (rows[:, KIND] < BOLT) & (rows[:, HEALTH] <= 0)
+        count = dead.sum()
+        self.kills += count
+        if count and self.respawn:
+            rows[dead] = random_ships(count, (self.x0, self.x1, self.height), self.random)
+        elif count:
+            spent |= dead
+        self.rows = rows[~spent]
+
+    def ships(self):
+        return int((self.rows[:, KIND] < BOLT).sum())
+
+    def publish(self, render):
+        view = numpy.frombuffer(render, numpy.float32)
+        count = min(len(self.rows), (len(view) - 1) // RENDER_FIELDS)
+        out = view[1:1 + count * RENDER_FIELDS].reshape(count, RENDER_FIELDS)
+        out[:, 0:2] = self.rows[:count, X:Y + 1]
+        out[:, 2] = self.rows[:count, HEADING]
+        out[:, 3] = self.rows[:count, KIND]
+        view[0] = count
+
+def worker(index, x0, x1, arena, seed, respawn, pipe, render):
+    region = Region(index, x0, x1, arena, seed, respawn)
+    busy = 0.0
+    while True:
+        message = pipe.recv()
+        if message[0] == "step":
+            start = time.time()
+            outgoing = region.move(message[1])
+            busy += time.time() - start
+            pipe.send([(rows.tostring(), migrants) for (rows, migrants) in
+                       (outgoing[0:2], outgoing[2:4])])
+        elif message[0] == "exchange":
+            start = time.time()
+            region.collide([(numpy.frombuffer(rows).reshape(-1, FIELDS), migrants)
+                            for (rows, migrants) in message[1]])
+            region.publish(render)
+            busy += time.time() - start
+            pipe.send((len(region.rows), region.ships(), region.kills, busy))
+        elif message[0] == "add":
+            region.rows = numpy.concatenate((region.rows,
+                                             numpy.frombuffer(message[1]).reshape(-1, FIELDS)))
+            region.publish(render)
+            pipe.send((len(region.rows), region.ships()))
+        elif message[0] == "stop":
+            pipe.close()
+            return
+
+class ShardedWorld(object):
+    RENDER_CAPACITY = 65536
+    def __init__(self, width, height, workers, ships, seed=0, respawn=True):
+        self.width = width
+        self.height = height
+        self.strip = float(width) / workers
+        # The last strip ends exactly at the arena wall
+        bounds = [i * self.strip for i in range(workers)] + [width]
+        self.pipes = []
+        self.renders = []
+        self.processes = []
+        for i in range(workers):
+            (parent, child) = multiprocessing.Pipe()
+            render = multiprocessing.RawArray("f", 1 + self.RENDER_CAPACITY * RENDER_FIELDS)
+            p = multiprocessing.Process(target=worker, args=(
+                i, bounds[i], bounds[i + 1], (width, height), seed + i, respawn,
+                child, render))
+            p.daemon = True
+            p.start()
+            self.pipes.append(parent)
+            self.renders.append(render)
+            self.processes.append(p)
+        rows = random_ships(ships, (0, width, height), numpy.random.RandomState(seed))
+        owner = numpy.minimum((rows[:, X] / self.strip).astype(numpy.intp), workers - 1)
+        for (i, pipe) in enumerate(self.pipes):
+            pipe.send(("add", rows[owner == i].tostring()))
+        (self.counts, self.ships) = zip(*[pipe.recv() for pipe in self.pipes])
+        (self.counts, self.ships) = (list(self.counts), list(self.ships))
+        self.kills = [0] * workers
+        self.busy = [0.0] * workers
+        self.ticks = 0
+        self.step_time = 0.0
+        self.exchanged = 0
+        self.images = None
+
+    def step(self, delta):
+        start = time.time()
+        for pipe in self.pipes:
+            pipe.send(("step", delta))
+        outgoing = [pipe.recv() for pipe in self.pipes]
+        last = len(self.pipes) - 1
+        for (i, pipe) in enumerate(self.pipes):
+            incoming = []
+            if i > 0:
+                incoming.append(outgoing[i - 1][1])
+            if i < last:
+                incoming.append(outgoing[i + 1][0])
+            self.exchanged += sum(len(rows) for (rows, migrants) in incoming) // (8 * FIELDS)
+            pipe.send(("exchange", incoming))
+        for (i, pipe) in enumerate(self.pipes):
+            (self.counts[i], self.ships[i], self.kills[i], self.busy[i]) = pipe.recv()
+        self.ticks += 1
+        self.step_time += time.time() - start
+
+    # Merged render state: one (x, y, heading, kind) row per entity, read
+    # straight out of the workers' shared arrays
+    def entities(self):
+        views = []
+        for render in self.renders:
+            view = numpy.frombuffer(render, numpy.float32)
+            views.append(view[1:1 + int(view[0]) * RENDER_FIELDS].reshape(-1, RENDER_FIELDS))
+        return numpy.concatenate(views)
+
+    def draw(self, surface, origin=(0, 0)):
+        if self.images is None:
+            from chaoshmup.world import Enemy, Player
+            from chaoshmup.world.weapons import LaserBolt, PlasmaBall
+            self.images = [cls.load_images()[0] for cls in (Enemy, Player, LaserBolt, PlasmaBall)]
+        rows = self.entities()
+        (w, h) = surface.get_size()
+        x = rows[:, 0] - origin[0]
+        y = rows[:, 1] - origin[1]
+        visible = (x > -RADIUS) & (x < w + RADIUS) & (y > -RADIUS) & (y < h + RADIUS)
+        images = self.images
+        surface.blits([(images[int(k)], images[int(k)].get_rect(center=(int(px), int(py))))
+                       for (px, py, k) in zip(x[visible], y[visible], rows[visible, 3])], False)
+        return visible.sum()
+
+    def close(self):
+        for pipe in self.pipes:
+            pipe.send(("stop",))
+        for p in self.processes:
+            p.join()
+
+    def stats(self):
+        ticks = max(1, self.ticks)
+        elapsed = max(self.step_time, 1e-9)
+        return {"workers": len(self.pipes), "entities": sum(self.counts), "ships": sum(self.ships),
+                "kills": sum(self.kills), "ticks": self.ticks,
+                "ticks_per_sec": self.ticks / elapsed,
+                "step_ms": self.step_time / ticks * 1000.0,
+                "busy_ms": max(self.busy) / ticks * 1000.0,
+                "exchanged": self.exchanged / float(ticks)}
+
+    def report(self):
+        return ("Shards: %(workers)d workers, %(entities)d entities, %(ticks_per_sec).1f ticks/sec, "
+                "step %(step_ms).2fms (busiest worker %(busy_ms).2fms), "
+                "%(exchanged).0f border rows/tick, %(kills)d kills" % self.stats())
+
+# Fixed total load spread over 1..16 workers; efficiency is the speedup over
+# one worker divided by the number of workers.
+def benchmark(ships=20000, ticks=120, workers=(1, 2, 4, 8, 16), arena=(16000, 12000)):
+    results = []
+    for n in workers:
+        world = ShardedWorld(arena[0], arena[1], n, ships)
+        world.step(1 / 60.0)
+        world.ticks = 0
+        world.step_time = 0.0
+        world.exchanged = 0
+        for i in range(ticks):
+            world.step(1 / 60.0)
+        s = world.stats()
+        world.close()
+        if not results:
+            base = s["ticks_per_sec"]
+        s["speedup"] = s["ticks_per_sec"] / base
+        s["efficiency"] = s["speedup"] / n
+        results.append(s)
+    return results
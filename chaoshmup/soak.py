@@ -0,0 +1,224 @@
+# Copyright (c) 2010, Morgan Lokhorst-Blight 
+# All rights reserved. 
+# 
+# Redistribution and use in source and binary forms, with or without 
+# modification, are permitted provided that the following conditions are met: 
+# 
+#  * Redistributions of source code must retain the above copyright notice, 
+#    this list of conditions and the following disclaimer. 
+#  * Redistributions in binary form must reproduce the above copyright 
+#    notice, this list of conditions and the following disclaimer in the 
+#    documentation and/or other materials provided with the distribution. 
+# 
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR AND CONTRIBUTORS ``AS IS'' AND ANY 
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED 
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE 
+# DISCLAIMED. IN NO EVENT SHALL THE AUTHOR OR CONTRIBUTORS BE LIABLE FOR ANY 
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES 
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR 
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER 
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT 
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY 
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH 
+# DAMAGE. 
+
+import gc
+import os
+import random
+import sys
+import time
+
+import pygame
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+from chaoshmup.controller import PlayerController
+from chaoshmup.game import generate_world, makeup, WINDOWWIDTH, WINDOWHEIGHT
+from chaoshmup.world.entity import Entity
+
+# Runs the game headlessly for a long stretch of simulated time with random
+# inputs, snapshotting memory every INTERVAL simulated seconds: the process
+# RSS, the live object count of every class after a full collection, and how
+# many entities are still alive after World.remove took them out of the
+# store ("stranded"). After the warm-up, anything whose fitted growth over
+# the rest of the run exceeds its slack fails the soak. Growing classes are
+# reported with what holds them and, where the interpreter has tracemalloc,
+# the allocation sites that grew.
+class Soak(object):
+    DELTA = 1 / 60.0
+    INTERVAL = 60.0
+    WARMUP = 0.2
+    OBJECT_SLACK = 200
+    RSS_SLACK = 8 * 1024 * 1024
+    PRESS_CHANCE = 0.02
+    def __init__(self, seconds, seed=0, draw=True, interval=None):
+        self.seconds = seconds
+        self.seed = seed
+        self.draw = draw
+        self.interval = interval or self.INTERVAL
+        self.snapshots = []
+        self.traces = []
+        self.frames = 0
+        self.elapsed = 0.0
+
+    def run(self):
+        random.seed(self.seed)
+        screen = pygame.display.get_surface() or pygame.Surface((WINDOWWIDTH, WINDOWHEIGHT))
+        w = generate_world()
+        actions = [a for p in sorted(w.players.sprites(), key=lambda p: p.name)
+                   for a in PlayerController(p).input_actions]
+        held = [False] * len(actions)
+        if tracemalloc is not None:
+            tracemalloc.start(8)
+        start = time.time()
+        t = 0.0
+        next_snapshot = 0.0
+        while t < self.seconds:
+            # Random presses and releases on every player's controls
+            for (i, a) in enumerate(actions):
+                if random.random() < self.PRESS_CHANCE:
+                    func = a.up_func if held[i] else a.down_func
+                    held[i] = not held[i] and a.up_func is not None
+                    if func:
+                        func()
+            w.update(self.DELTA)
+            makeup(w)
+            if self.draw:
+                w.draw(screen)
+            t += self.DELTA
+            self.frames += 1
+            if t >= next_snapshot:
+                self.snapshot(w, t)
+                next_snapshot += self.interval
+        self.snapshot(w, t)
+        self.elapsed = time.time() - start
+        if tracemalloc is not None:
+            tracemalloc.stop()
+        return not self.leaks()
+
+    def snapshot(self, world, t):
+        gc.collect()
+        counts = {}
+        stranded = 0
+        valid = world.store.valid
+        for obj in gc.get_objects():
+            name = type(obj).__name__
+            counts[name] = counts.get(name, 0) + 1
+            if isinstance(obj, Entity):
+                # Weapons are entities that never enter the store
+                handle = getattr(obj, "handle", None)
+                if handle is not None and not valid(handle):
+                    stranded += 1
+        counts["stranded entities"] = stranded
+        self.snapshots.append((t, rss(), counts))
+        if tracemalloc is not None:
+            self.traces.append(tracemalloc.take_snapshot())
+
+    # Everything whose trend after the warm-up adds up to more than its
+    # slack, as (name, first, last, growth per hour)
+    def leaks(self):
+        samples = [s for s in self.snapshots if s[0] >= self.seconds * self.WARMUP]
+        if len(samples) < 4:
+            return []
+        times = [s[0] for s in samples]
+        series = [("RSS bytes", [s[1] for s in samples], self.RSS_SLACK)]
+        names = set()
+        for s in samples:
+            names.update(s[2])
+        for name in sorted(names):
+            series.append((name, [s[2].get(name, 0) for s in samples], self.OBJECT_SLACK))
+        leaks = []
+        for (name, values, slack) in series:
+            if values[0] is None:
+                continue
+            slope = trend(times, values)
+            if slope * (times[-1] - times[0]) > slack and values[-1] > values[0]:
+                leaks.append((name, values[0], values[-1], slope * 3600.0))
+        return leaks
+
+    # The types of whatever refers to a sample of a class's live objects
+    def holders(self, name, sample=20):
+        gc.collect()
+        objects = [o for o in gc.get_objects() if type(o).__name__ == name][:sample]
+        held = {}
+        frame = sys._getframe()
+        for o in objects:
+            for r in gc.get_referrers(o):
+                if r is objects or r is frame:
+                    continue
+                kind = type(r).__name__
+                held[kind] = held.get(kind, 0) + 1
+        del objects
+        return sorted(held.iteritems(), key=lambda h: -h[1])
+
+    def stats(self):
+        (t, last_rss, counts) = self.snapshots[-1]
+        return {"seconds": t, "frames": self.frames, "elapsed": self.elapsed,
+                "speedup": t / self.elapsed if self.elapsed else 0.0,
+                "rss": last_rss, "objects": sum(counts.itervalues()),
+                "stranded": counts["stranded entities"], "leaks": self.leaks()}
+
+    def report(self):
+        s = self.stats()
+        lines = ["Soak: %.2f simulated hours, %d frames in %.0fs (%.0fx real time), "
+                 "%s RSS, %d objects, %d stranded entities" % (
+                     s["seconds"] / 3600.0, s["frames"], s["elapsed"], s["speedup"],
+                     "%.1fMB" % (s["rss"] / 1048576.0) if s["rss"] else "unknown",
+                     s["objects"], s["stranded"])]
+        for (name, first, last, rate) in s["leaks"]:
+            lines.append("  GROWING %-20s %10d -> %10d  (%+.0f/hour)" % (name, first, last, rate))
+            if name in ("RSS bytes", "stranded entities"):
+                continue
+            holders = ", ".join("%s %d" % h for h in self.holders(name)[:5])
+            if holders:
+                lines.append("    held by %s" % holders)
+        if len(self.traces) > 1:
+            warm = self.traces[min(len(self.traces) - 1, int(len(self.traces) * self.WARMUP))]
+            lines.append("  Allocation sites that grew since warm-up:")
+            for d in self.traces[-1].compare_to(warm, "lineno")[:10]:
+                if d.size_diff > 0:
+                    lines.append("    %s" % d)
+        if not s["leaks"]:
+            lines.append("  nothing grew past its slack")
+        return "\n".join(lines)
+
+# Resident set size in bytes, where /proc says
+def rss():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (IOError, OSError, ValueError):
+        return None
+
+# Least-squares slope of values over times
+def trend(times, values):
+    n = float(len(times))
+    mt = sum(times) / n
+    mv = sum(values) / n
+    var = sum((t - mt) ** 2 for t in times)
+    if not var:
+        return 0.0
+    return sum((t - mt) * (v - mv) for (t, v) in zip(times, values)) / var
+
+def main(args=None):
+    if args is None:
+        args = sys.argv[1:]
+    hours = 1.0
+    seed = 0
+    for a in args:
+        if a.startswith("--seed="):
+            seed = int(a.split("=", 1)[1])
+        elif not a.startswith("--"):
+            hours = float(a)
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    pygame.init()
+    pygame.display.set_mode((WINDOWWIDTH, WINDOWHEIGHT))
+    soak = Soak(hours * 3600.0, seed, "--no-draw" not in args)
+    ok = soak.run()
+    print soak.report()
+    pygame.quit()
+    if not ok:
+        sys.exit(1)
@@ -26,19 +26,45 @@ import random
 
 import pygame
 
+import assets
+from camera import Camera
+from ecs import EntityStore
+from events import EventBus
+from fork import WorldFork
 from entity import Entity
-from ship import Enemy, Player
+from masks import MaskCache
+from particles import Particles
+from render import Renderer
+from timers import TimerWheel
+from tints import TintCache
+from transforms import TransformPool
+from ship import Enemy, PathEnemy, Player
+from systems import PathSystem, PhysicsSystem, BoundsSystem, TimerSystem, AnimationSystem, \
+     CollisionSystem, BeamSystem, CleanupSystem, EffectsSystem, Scheduler
 
 class Explosion(Entity):
+    __slots__ = ()
     IMAGE_FILE = "images/i_are_spaceship.png"
     FRAME_DELAY = 0.3
-    def __init__(self, world, pos):
+    COMPONENTS = ("transform", "sprite")
+    # A still explosion lasts as long but isn't animated: one timer ends it
+    # instead of a timer per frame
+    def __init__(self, world, pos, still=False):
         Entity.__init__(self, world)
-        self.rect.center = pos
+        self.position = pos
+        if still:
+            self.frame_timer.cancel()
+            self.frame_timer = world.timers.schedule_in(
+                self.FRAME_DELAY * len(self.animation), self.expired)
 
-    def load_images(self):
-        image = pygame.image.load(self.IMAGE_FILE)
-        self.images = [image.subsurface(pygame.Rect(0,32,16,16)),
+    def expired(self, timer):
+        self.frame_timer = None
+        self.animation_complete()
+
+    @classmethod
+    def load_images(cls):
+        image = assets.image(cls.IMAGE_FILE)
+        return [image.subsurface(pygame.Rect(0,32,16,16)),
                        image.subsurface(pygame.Rect(16,32,16,16)),
                        image.subsurface(pygame.Rect(32,32,16,16)),
                        image.subsurface(pygame.Rect(48,32,16,16))]
@@ -46,63 +72,94 @@ class Explosion(Entity):
     def animation_complete(self):
         self.alive = False
     
+def image_files(cls=Entity):
+    files = set([cls.IMAGE_FILE])
+    for sub in cls.__subclasses__():
+        files.update(image_files(sub))
+    files.discard("")
+    return files
+
 class World(object):
-    def __init__(self, width, height):
+    NARROWPHASE = True
+    SCROLL_SPEED = 60.0
+    TICK_RATE = 60
+    MULTIRATE = True
+    # Deaths away from the camera skip their spark and debris particles, and
+    # their explosions are still
+    CHEAP_OFFSCREEN = True
+    SCHEDULE = (PathSystem, PhysicsSystem, BoundsSystem, TimerSystem, AnimationSystem,
+                CollisionSystem, BeamSystem, CleanupSystem, EffectsSystem)
+    def __init__(self, width, height, view=None):
         self.width = width
         self.height = height
+        (view_width, view_height) = view or (width, height)
+        self.camera = Camera(view_width, view_height, pygame.Rect(0, 0, width, height))
+        self.store = EntityStore()
+        self.timers = TimerWheel()
+        self.level = None
+        self.beams = set()
+        self.distance = 0.0
+        self.systems = [s() for s in self.SCHEDULE]
+        self.schedule = Scheduler(self.systems, self.TICK_RATE, self.MULTIRATE)
+        self.particles = Particles()
         self.players = pygame.sprite.Group()
         self.enemies = pygame.sprite.Group()
         self.projectiles = pygame.sprite.Group()
         self.explosions = pygame.sprite.Group()
+        self.layers = (self.explosions, self.projectiles, self.enemies, self.players)
+        self.renderer = Renderer()
+        self.masks = MaskCache() if self.NARROWPHASE else None
+        self.tints = TintCache()
+        self.transforms = TransformPool(self.tints)
+        self.events = EventBus()
+        self.events.subscribe("fire", self.fired)
+        self.events.subscribe("kill", self.exploded)
 
     def update(self, delta):
-        self.players.update(delta)
-        self.enemies.update(delta)
-        self.projectiles.update(delta)
-        self.explosions.update(delta)
+        self.distance += self.SCROLL_SPEED * delta
+        self.schedule.run(self, delta)
+        self.events.dispatch()
+        self.transforms.apply()
 
-        # Keep players on the screen
-        for p in self.players.sprites():
-            if p.rect.right > self.width:
-                p.rect.right = self.width
-            if p.rect.left < 0:
-                p.rect.left = 0
-            if p.rect.bottom > self.height:
-                p.rect.bottom = self.height
-            if p.rect.top < 0:
-                p.rect.top = 0
+    # A simulation-only clone for looking ahead; see fork.py
+    def fork(self, area=None):
+        return WorldFork(self, area)
 
-        # Collision detection
-        projectile_enemy = pygame.sprite.groupcollide(self.enemies, self.projectiles, False, False)
-        for (enemy, projectiles) in projectile_enemy.iteritems():
-            for projectile in projectiles:
-                if projectile.owner.team != enemy.team:
-                    enemy.hit(projectile)
-                    self.projectiles.remove(projectile)
-            
-        # Cleanup
-        enemydead = [x for x in self.enemies.sprites()[:] if not x.alive]
-        for x in enemydead:
-            self.explosions.add(Explosion(self, x.rect.center))
-        self.enemies.remove(enemydead)
+    # Muzzle flashes for this tick's shots
+    def fired(self, shots):
+        emit = self.particles.emit
+        for (weapon, count, x, y, heading) in shots.rows():
+            emit("muzzle", (x, y), heading)
 
-        expldead = [x for x in self.explosions.sprites()[:] if not x.alive]
-        self.explosions.remove(expldead)
+    # Explosions where ships died this tick
+    def exploded(self, kills):
+        cheap = self.CHEAP_OFFSCREEN
+        nearby = self.camera.nearby
+        for (entity, source, x, y) in kills.rows():
+            if cheap and not nearby(entity.rect):
+                self.explosions.add(Explosion(self, (x, y), still=True))
+                continue
+            self.explosions.add(Explosion(self, (x, y)))
+            self.particles.emit("sparks", (x, y))
+            self.particles.emit("debris", (x, y))
 
-        projectiledead = [x for x in self.projectiles.sprites()[:] if x.rect.bottom < 0 or x.rect.right < 0 or x.rect.left > self.width or x.rect.top > self.height]
-        self.projectiles.remove(projectiledead)
+    def remove(self, entities):
+        for e in entities:
+            e.kill()
+            if self.store.valid(e.handle):
+                e.removed()
+                self.store.destroy(e.handle)
 
-    def clear_callback(self, surf, rect):
-        surf.fill((0,0,0), rect)
-        
     def draw(self, surface):
-        self.explosions.clear(surface, self.clear_callback)
-        self.projectiles.clear(surface, self.clear_callback)
-        self.enemies.clear(surface, self.clear_callback)
-        self.players.clear(surface, self.clear_callback)
-        
-        self.explosions.draw(surface)
-        self.projectiles.draw(surface)
-        self.enemies.draw(surface)
-        self.players.draw(surface)
-
+        # Images for anything spawned since the update
+        self.transforms.apply()
+        offset = self.camera.offset
+        if self.level:
+            self.level.draw(surface, self.distance, offset)
+        else:
+            self.renderer.clear(surface)
+        rects = self.particles.draw(surface, self.renderer.dirty, offset)
+        changed = self.renderer.draw(surface, self.layers, rects, self.camera)
+        for b in self.beams:
+            b.draw(surface, offset)
+        return changed
@@ -0,0 +1,55 @@
+# Copyright (c) 2010, Morgan Lokhorst-Blight 
+# All rights reserved. 
+# 
+# Redistribution and use in source and binary forms, with or without 
+# modification, are permitted provided that the following conditions are met: 
+# 
+#  * Redistributions of source code must retain the above copyright notice, 
+#    this list of conditions and the following disclaimer. 
+#  * Redistributions in binary form must reproduce the above copyright 
+#    notice, this list of conditions and the following disclaimer in the 
+#    documentation and/or other materials provided with the distribution. 
+# 
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR AND CONTRIBUTORS ``AS IS'' AND ANY 
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED 
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE 
+# DISCLAIMED. IN NO EVENT SHALL THE AUTHOR OR CONTRIBUTORS BE LIABLE FOR ANY 
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES 
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR 
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER 
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT 
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY 
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH 
+# DAMAGE. 
+
+from multiprocessing.pool import ThreadPool
+
+import pygame
+
+# Decoded images shared by every entity, keyed by file name
+images = {}
+
+def image(path):
+    try:
+        return images[path]
+    except KeyError:
+        img = images[path] = pygame.image.load(path)
+        return img
+
+def _decode(path):
+    return (path, pygame.image.load(path))
+
+# Starts decoding on a thread pool and returns immediately; pass the result to
+# install() once the display is up so the images can be converted.
+def preload(paths, threads=4):
+    paths = [p for p in set(paths) if p and p not in images]
+    pool = ThreadPool(max(1, min(threads, len(paths))))
+    result = pool.map_async(_decode, paths)
+    pool.close()
+    return result
+
+def install(result, convert=True):
+    for (path, img) in result.get():
+        if convert:
+            img = img.convert_alpha()
+        images[path] = img
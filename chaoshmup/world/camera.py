@@ -0,0 +1,79 @@
+# Copyright (c) 2010, Morgan Lokhorst-Blight 
+# All rights reserved. 
+# 
+# Redistribution and use in source and binary forms, with or without 
+# modification, are permitted provided that the following conditions are met: 
+# 
+#  * Redistributions of source code must retain the above copyright notice, 
+#    this list of conditions and the following disclaimer. 
+#  * Redistributions in binary form must reproduce the above copyright 
+#    notice, this list of conditions and the following disclaimer in the 
+#    documentation and/or other materials provided with the distribution. 
+# 
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR AND CONTRIBUTORS ``AS IS'' AND ANY 
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED 
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE 
+# DISCLAIMED. IN NO EVENT SHALL THE AUTHOR OR CONTRIBUTORS BE LIABLE FOR ANY 
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES 
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR 
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER 
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT 
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY 
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH 
+# DAMAGE. 
+
+import pygame
+
+# Maps world coordinates to the screen for worlds larger than the window.
+# view is the part of the world on screen; near is the view grown by MARGIN,
+# the area in which sprites are kept rotated and animated so they are ready
+# by the time they scroll in. With cull off every sprite is drawn and
+# rotated, for comparison.
+class Camera(object):
+    MARGIN = 64
+    def __init__(self, width, height, bounds=None, cull=True):
+        self.view = pygame.Rect(0, 0, width, height)
+        self.bounds = bounds
+        self.cull = cull
+        self.near = self.view.inflate(self.MARGIN * 2, self.MARGIN * 2)
+        self.drawn = 0
+        self.culled = 0
+        self.frames = 0
+        self.total_drawn = 0
+        self.total_culled = 0
+
+    def move(self, centre):
+        self.view.center = centre
+        if self.bounds:
+            self.view.clamp_ip(self.bounds)
+        self.near.center = self.view.center
+
+    @property
+    def offset(self):
+        return (-self.view.x, -self.view.y)
+
+    def to_screen(self, pos):
+        return (pos[0] - self.view.x, pos[1] - self.view.y)
+
+    def to_world(self, pos):
+        return (pos[0] + self.view.x, pos[1] + self.view.y)
+
+    def nearby(self, rect):
+        return not self.cull or self.near.colliderect(rect)
+
+    def count(self, drawn, culled):
+        self.drawn = drawn
+        self.culled = culled
+        self.frames += 1
+        self.total_drawn += drawn
+        self.total_culled += culled
+
+    def stats(self):
+        frames = max(1, self.frames)
+        return {"drawn": self.drawn, "culled": self.culled,
+                "mean_drawn": self.total_drawn / float(frames),
+                "mean_culled": self.total_culled / float(frames)}
+
+    def report(self):
+        return ("Camera: %(drawn)d drawn, %(culled)d culled last frame; "
+                "%(mean_drawn).1f drawn, %(mean_culled).1f culled on average" % self.stats())
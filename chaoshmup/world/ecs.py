@@ -0,0 +1,272 @@
+# Copyright (c) 2010, Morgan Lokhorst-Blight 
+# All rights reserved. 
+# 
+# Redistribution and use in source and binary forms, with or without 
+# modification, are permitted provided that the following conditions are met: 
+# 
+#  * Redistributions of source code must retain the above copyright notice, 
+#    this list of conditions and the following disclaimer. 
+#  * Redistributions in binary form must reproduce the above copyright 
+#    notice, this list of conditions and the following disclaimer in the 
+#    documentation and/or other materials provided with the distribution. 
+# 
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR AND CONTRIBUTORS ``AS IS'' AND ANY 
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED 
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE 
+# DISCLAIMED. IN NO EVENT SHALL THE AUTHOR OR CONTRIBUTORS BE LIABLE FOR ANY 
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES 
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR 
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER 
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT 
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY 
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH 
+# DAMAGE. 
+
+from array import array
+from collections import namedtuple
+from operator import itemgetter
+
+# Component schemas: each component is a tuple of (field, typecode) pairs.
+# Numeric fields are stored in array.array columns, everything else in lists.
+COMPONENTS = {
+    "transform": (("x", "d"), ("y", "d"), ("orientation", "d"), ("rotation", "d")),
+    "physics": (("vx", "d"), ("vy", "d"), ("ax", "d"), ("ay", "d"),
+                ("max_vel", "d"), ("friction", "d")),
+    "sprite": (("sprite", None),),
+    "health": (("health", "d"),),
+    "weapon": (("weapons", None),),
+    "team": (("team", None),),
+    "path": (("path_start", "l"), ("path_samples", "l"), ("path_step", "d"),
+             ("path_loop", "b"), ("path_distance", "d"), ("path_speed", "d"),
+             ("path_x", "d"), ("path_y", "d")),
+    }
+
+Handle = namedtuple("Handle", "index generation")
+
+class StaleHandle(LookupError):
+    pass
+
+class Archetype(object):
+    def __init__(self, components):
+        self.components = components
+        self.fields = {}
+        self.columns = {}
+        for c in components:
+            for (field, typecode) in COMPONENTS[c]:
+                self.fields[field] = typecode
+                if typecode is None:
+                    self.columns[field] = []
+                else:
+                    self.columns[field] = array(typecode)
+        self.handles = []
+
+    def __len__(self):
+        return len(self.handles)
+
+    def add(self, handle, values):
+        for (field, column) in self.columns.iteritems():
+            if field in values:
+                column.append(values[field])
+            elif self.fields[field] is None:
+                column.append(None)
+            else:
+                column.append(0)
+        self.handles.append(handle)
+        return len(self.handles) - 1
+
+    # Adds a row per handle; each value is a sequence with one entry per row
+    # or a single value for all of them
+    def extend(self, handles, values):
+        n = len(handles)
+        for (field, column) in self.columns.iteritems():
+            value = values.get(field)
+            if isinstance(value, (list, tuple, array)):
+                column.extend(value)
+            elif value is None and self.fields[field] is not None:
+                column.extend([0] * n)
+            else:
+                column.extend([value] * n)
+        first = len(self.handles)
+        self.handles.extend(handles)
+        return first
+
+    def remove(self, row):
+        # Swap the last row into the hole so the columns stay dense, and
+        # return the handle that moved (if any) so the store can patch it.
+        last = len(self.handles) - 1
+        for column in self.columns.itervalues():
+            column[row] = column[last]
+            column.pop()
+        moved = self.handles[last]
+        self.handles[row] = moved
+        self.handles.pop()
+        if row == last:
+            return None
+        return moved
+
+class EntityStore(object):
+    def __init__(self):
+        self.archetypes = {}
+        self._generations = []
+        self._locations = []
+        self._free = []
+
+    def __len__(self):
+        return sum(len(a) for a in self.archetypes.itervalues())
+
+    def archetype(self, components):
+        key = frozenset(components)
+        if key not in self.archetypes:
+            for c in key:
+                if c not in COMPONENTS:
+                    raise KeyError("Unknown component %r" % c)
+            self.archetypes[key] = Archetype(key)
+        return self.archetypes[key]
+
+    def create(self, components, **values):
+        arch = self.archetype(components)
+        if self._free:
+            index = self._free.pop()
+        else:
+            index = len(self._generations)
+            self._generations.append(0)
+            self._locations.append(None)
+        handle = Handle(index, self._generations[index])
+        self._locations[index] = (arch, arch.add(handle, values))
+        return handle
+
+    # Creates count entities at once, with values as for Archetype.extend
+    def create_many(self, components, count, **values):
+        arch = self.archetype(components)
+        generations = self._generations
+        handles = []
+        for i in xrange(count):
+            if self._free:
+                index = self._free.pop()
+            else:
+                index = len(generations)
+                generations.append(0)
+                self._locations.append(None)
+            handles.append(Handle(index, generations[index]))
+        first = arch.extend(handles, values)
+        locations = self._locations
+        for (row, handle) in enumerate(handles, first):
+            locations[handle.index] = (arch, row)
+        return handles
+
+    def valid(self, handle):
+        return (handle.index < len(self._generations) and
+                self._generations[handle.index] == handle.generation and
+                self._locations[handle.index] is not None)
+
+    def locate(self, handle):
+        if not self.valid(handle):
+            raise StaleHandle("Stale or invalid entity handle %r" % (handle,))
+        return self._locations[handle.index]
+
+    def destroy(self, handle):
+        (arch, row) = self.locate(handle)
+        moved = arch.remove(row)
+        if moved is not None:
+            self._locations[moved.index] = (arch, row)
+        self._locations[handle.index] = None
+        self._generations[handle.index] += 1
+        self._free.append(handle.index)
+
+    def get(self, handle, field):
+        (arch, row) = self.locate(handle)
+        return arch.columns[field][row]
+
+    def set(self, handle, field, value):
+        (arch, row) = self.locate(handle)
+        arch.columns[field][row] = value
+
+    def query(self, *components):
+        return [a for (k, a) in self.archetypes.iteritems()
+                if a.handles and k.issuperset(components)]
+
+    def fork(self, select=None):
+        return StoreFork(self, select)
+
+# A copy-on-write view of an archetype for world forks. Columns are shared
+# with the original until write() asks for them, when the fork takes its own
+# copy. Given rows, the fork instead holds compact copies of just those rows.
+# Rows are never added or removed, so handles keep their rows.
+class ArchetypeFork(object):
+    def __init__(self, arch, rows=None):
+        self.components = arch.components
+        self.fields = arch.fields
+        if rows is None:
+            self.columns = dict(arch.columns)
+            self.handles = arch.handles
+            self.copied = set()
+            self.rows = None
+        else:
+            self.columns = {}
+            take = itemgetter(*rows) if len(rows) > 1 else lambda column: [column[i] for i in rows]
+            for (field, column) in arch.columns.iteritems():
+                values = take(column)
+                typecode = arch.fields[field]
+                self.columns[field] = array(typecode, values) if typecode else list(values)
+            self.handles = [arch.handles[i] for i in rows]
+            self.copied = set(self.columns)
+            self.rows = dict((h.index, i) for (i, h) in enumerate(self.handles))
+
+    def __len__(self):
+        return len(self.handles)
+
+    def write(self, *fields):
+        for field in fields:
+            if field not in self.copied:
+                column = self.columns[field]
+                self.columns[field] = column[:] if self.fields[field] else list(column)
+                self.copied.add(field)
+        return [self.columns[field] for field in fields]
+
+# A fork of an EntityStore for simulating ahead. Forking the whole store
+# costs one copy-on-write view per archetype whatever the number of
+# entities, with handles resolved through the original's locations; select
+# (called with each archetype, returning row indices or None for all) limits
+# the fork to some rows. Only valid until the original next changes.
+class StoreFork(object):
+    def __init__(self, store, select=None):
+        self.source = store
+        self.archetypes = {}
+        self.forks = {}
+        for (key, arch) in store.archetypes.iteritems():
+            fork = self.archetypes[key] = ArchetypeFork(arch, select(arch) if select else None)
+            self.forks[id(arch)] = fork
+
+    def __len__(self):
+        return sum(len(a) for a in self.archetypes.itervalues())
+
+    def valid(self, handle):
+        if not self.source.valid(handle):
+            return False
+        fork = self.forks[id(self.source.locate(handle)[0])]
+        return fork.rows is None or handle.index in fork.rows
+
+    def locate(self, handle):
+        (arch, row) = self.source.locate(handle)
+        fork = self.forks[id(arch)]
+        if fork.rows is not None:
+            try:
+                row = fork.rows[handle.index]
+            except KeyError:
+                raise StaleHandle("Entity %r is not in this fork" % (handle,))
+        return (fork, row)
+
+    def get(self, handle, field):
+        (arch, row) = self.locate(handle)
+        return arch.columns[field][row]
+
+    def set(self, handle, field, value):
+        (arch, row) = self.locate(handle)
+        arch.write(field)[0][row] = value
+
+    def query(self, *components):
+        return [a for (k, a) in self.archetypes.iteritems()
+                if a.handles and k.issuperset(components)]
+
+    def fork(self, select=None):
+        return StoreFork(self, select)
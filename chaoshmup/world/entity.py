@@ -26,44 +26,101 @@ import pygame
 
 from contrib.vector import Vector
 
+import assets
+
+def stored(field):
+    def fget(self):
+        return self.world.store.get(self.handle, field)
+    def fset(self, value):
+        self.world.store.set(self.handle, field, value)
+    return property(fget, fset)
+
+def stored_vector(xfield, yfield):
+    def fget(self):
+        (arch, row) = self.world.store.locate(self.handle)
+        return Vector((arch.columns[xfield][row], arch.columns[yfield][row]))
+    def fset(self, value):
+        (arch, row) = self.world.store.locate(self.handle)
+        arch.columns[xfield][row] = value[0]
+        arch.columns[yfield][row] = value[1]
+    return property(fget, fset)
+
+# Entities are facades over a row in the world's EntityStore. Their transform
+# and physics state live in the store and are advanced by the world's systems.
+# Images and animation tables are loaded once per class and shared; subclasses
+# must declare __slots__ (including the Sprite group dict). Sprite itself has
+# no __slots__, so instances keep a __dict__ slot, but nothing is stored in
+# it and the dict is never created.
 class Entity(pygame.sprite.Sprite):
+    __slots__ = ("_Sprite__g", "world", "handle", "animation", "frame",
+                 "last_frame", "image", "rect", "frame_timer", "alive",
+                 "last_orientation", "palette", "flash_timer")
     IMAGE_FILE = ""
     DEFAULT_ANIMATION = "default"
     FRAME_DELAY = 99999999.0
+    FLASH_TIME = 0.08
     MAX_VEL = 500
     FRICTION_MULTIPLIER = 0.5
     START_ORIENTATION = 0
     START_ROTATION = 0
-    def __init__(self, world):
+    COMPONENTS = ("transform", "physics", "sprite")
+    images = None
+    animations = None
+    # handle is given when the entity was made as part of a batch (see
+    # Projectile.volley): the batch has already made its store row, and
+    # starts its frame timer along with the rest
+    def __init__(self, world, handle=None):
         pygame.sprite.Sprite.__init__(self)
         self.world = world
-        self.load_images()
-        self.load_animations()
+        batched = handle is not None
+        if not batched:
+            handle = world.store.create(self.COMPONENTS, sprite=self,
+                                        orientation=self.START_ORIENTATION,
+                                        rotation=self.START_ROTATION,
+                                        max_vel=self.MAX_VEL,
+                                        friction=self.FRICTION_MULTIPLIER)
+        self.handle = handle
+        cls = self.__class__
+        if cls.__dict__.get("images") is None:
+            cls.images = cls.load_images()
+            cls.animations = cls.load_animations(cls.images)
         self.animation = self.animations[self.DEFAULT_ANIMATION]
         self.frame = 0
         self.last_frame = self.frame
         self.image = self.images[self.animation[self.frame]]
         self.rect = pygame.Rect(0,0,self.image.get_width(),self.image.get_height())
-        self.acceleration = Vector((0,0))
-        self.velocity = Vector((0,0))
-        self.frametime = 0.0
         self.alive = True
-        self.orientation = self.START_ORIENTATION
-        self.last_orientation = self.orientation
-        self.rotation = self.START_ROTATION
+        self.last_orientation = self.START_ORIENTATION
+        self.frame_timer = None
+        self.palette = None
+        self.flash_timer = None
+        if len(self.animation) > 1 and not batched:
+            self.frame_timer = world.timers.schedule_in(self.FRAME_DELAY, self.frame_due)
+        world.events.emit("spawn", self)
+
+    orientation = stored("orientation")
+    rotation = stored("rotation")
+    velocity = stored_vector("vx", "vy")
+    acceleration = stored_vector("ax", "ay")
 
     @property
     def position(self):
-        return Vector(self.rect.center)
+        (arch, row) = self.world.store.locate(self.handle)
+        return Vector((arch.columns["x"][row], arch.columns["y"][row]))
     @position.setter
-    def position(self,newpos):
+    def position(self, newpos):
+        (arch, row) = self.world.store.locate(self.handle)
+        arch.columns["x"][row] = newpos[0]
+        arch.columns["y"][row] = newpos[1]
         self.rect.center = tuple(newpos)
 
-    def load_images(self):
-        self.images = [pygame.image.load(self.IMAGE_FILE)]
+    @classmethod
+    def load_images(cls):
+        return [assets.image(cls.IMAGE_FILE)]
 
-    def load_animations(self):
-        self.animations = {"default": range(len(self.images))}
+    @classmethod
+    def load_animations(cls, images):
+        return {"default": range(len(images))}
 
     def next_frame(self):
         self.last_frame = self.frame
@@ -76,29 +133,54 @@ class Entity(pygame.sprite.Sprite):
     def animation_complete(self):
         self.frame = 0
 
-    def update(self, delta):
-        # Animate
-        self.frametime += delta
-        if self.frametime >= self.FRAME_DELAY:
-            self.image = self.next_frame()
-            self.frametime = 0.0
-
-        # Rotate
-        self.orientation += self.rotation * delta
-        if self.orientation != self.last_orientation or self.frame != self.last_frame:
-            self.image = pygame.transform.rotate(self.images[self.animation[self.frame]], self.orientation)
-            center = self.rect.center
-            self.rect.size = self.image.get_rect().size
-            self.rect.center = center
-        self.last_orientation = self.orientation
-
-        # Apply acceleration and clip velocity, apply friction
-        self.velocity += self.acceleration
-        length = self.velocity.length
-        if length > self.MAX_VEL:
-            self.velocity = self.velocity.scaled_to(self.MAX_VEL)
-        if self.FRICTION_MULTIPLIER != 1 and length > 0 and self.acceleration.length <= 0:
-            self.velocity *= self.FRICTION_MULTIPLIER + (1 - self.FRICTION_MULTIPLIER) * delta
-
-        # Move
-        self.rect = self.rect.move(self.velocity.x * delta, self.velocity.y * delta)
+    def frame_due(self, timer):
+        self.next_frame()
+        if self.world.camera.nearby(self.rect):
+            self.animate(self.orientation)
+        self.frame_timer = None
+        if self.alive:
+            self.frame_timer = self.world.timers.schedule(timer.deadline + self.FRAME_DELAY,
+                                                          self.frame_due)
+
+    # Shows the entity in the flash palette for FLASH_TIME
+    def flash(self):
+        if self.flash_timer:
+            self.flash_timer.cancel()
+        self.flash_timer = self.world.timers.schedule_in(self.FLASH_TIME, self.flash_done)
+        self.repaint()
+
+    def flash_done(self, timer):
+        self.flash_timer = None
+        self.repaint()
+
+    # Redraws the current frame now, e.g. after a palette change
+    def repaint(self):
+        self.last_frame = None
+        if self.world.camera.nearby(self.rect):
+            self.animate(self.orientation)
+
+    # Called by the world just before the entity leaves the store
+    def removed(self):
+        if self.frame_timer:
+            self.frame_timer.cancel()
+            self.frame_timer = None
+        if self.flash_timer:
+            self.flash_timer.cancel()
+            self.flash_timer = None
+        self.world.transforms.cancel(self)
+
+    # The new image is made with the rest of the tick's transforms and
+    # handed back through show()
+    def animate(self, orientation):
+        if orientation != self.last_orientation or self.frame != self.last_frame:
+            palette = "flash" if self.flash_timer else self.palette
+            self.world.transforms.request(self, self.images[self.animation[self.frame]],
+                                          palette, orientation)
+        self.last_orientation = orientation
+        self.last_frame = self.frame
+
+    def show(self, image):
+        self.image = image
+        center = self.rect.center
+        self.rect.size = image.get_size()
+        self.rect.center = center
@@ -0,0 +1,138 @@
+# Copyright (c) 2010, Morgan Lokhorst-Blight 
+# All rights reserved. 
+# 
+# Redistribution and use in source and binary forms, with or without 
+# modification, are permitted provided that the following conditions are met: 
+# 
+#  * Redistributions of source code must retain the above copyright notice, 
+#    this list of conditions and the following disclaimer. 
+#  * Redistributions in binary form must reproduce the above copyright 
+#    notice, this list of conditions and the following disclaimer in the 
+#    documentation and/or other materials provided with the distribution. 
+# 
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR AND CONTRIBUTORS ``AS IS'' AND ANY 
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED 
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE 
+# DISCLAIMED. IN NO EVENT SHALL THE AUTHOR OR CONTRIBUTORS BE LIABLE FOR ANY 
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES 
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR 
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER 
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT 
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY 
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH 
+# DAMAGE. 
+
+import time
+from array import array
+
+# Event kinds and their fields, laid out like the store's components:
+# numeric fields come out as array.array columns, everything else as lists.
+# Kinds are dispatched in ORDER.
+EVENTS = {
+    "spawn": (("entity", None),),
+    "fire": (("weapon", None), ("shots", "l"), ("x", "d"), ("y", "d"), ("heading", "d")),
+    "hit": (("target", None), ("source", None), ("damage", "d")),
+    "kill": (("entity", None), ("source", None), ("x", "d"), ("y", "d")),
+    }
+ORDER = ("spawn", "fire", "hit", "kill")
+
+# One tick's events of a kind. Emitting appends the record as it came;
+# subscribers read it as rows, or as typed columns built once per batch.
+class EventBuffer(object):
+    def __init__(self, kind, fields):
+        self.kind = kind
+        self.fields = fields
+        self.records = []
+        self._columns = None
+
+    def __len__(self):
+        return len(self.records)
+
+    def rows(self):
+        return self.records
+
+    @property
+    def columns(self):
+        if self._columns is None:
+            values = zip(*self.records) or [()] * len(self.fields)
+            self._columns = {}
+            for ((field, typecode), column) in zip(self.fields, values):
+                self._columns[field] = array(typecode, column) if typecode else list(column)
+        return self._columns
+
+    def clear(self):
+        del self.records[:]
+        self._columns = None
+
+# Systems emit() compact event records into per-tick buffers instead of
+# reacting inline, and subscribers get each kind's buffer as one batch when
+# the world calls dispatch() at the end of its update. Emitting costs the
+# same however many subscribers there are. Events emitted while a batch is
+# being handled go into a fresh buffer and are delivered next dispatch.
+class EventBus(object):
+    def __init__(self, events=None, order=None):
+        events = events or EVENTS
+        self.order = order or ORDER
+        self.buffers = {}
+        self.spares = {}
+        self.subscribers = {}
+        self.emitted = {}
+        for (kind, fields) in events.iteritems():
+            self.buffers[kind] = EventBuffer(kind, fields)
+            self.spares[kind] = EventBuffer(kind, fields)
+            self.subscribers[kind] = []
+            self.emitted[kind] = 0
+        self.dispatches = 0
+        self.delivered = 0
+        self.peak = 0
+        self.time = 0.0
+
+    def subscribe(self, kind, callback):
+        self.subscribers[kind].append(callback)
+
+    def unsubscribe(self, kind, callback):
+        self.subscribers[kind].remove(callback)
+
+    def emit(self, kind, *values):
+        self.buffers[kind].records.append(values)
+
+    def dispatch(self):
+        start = time.time()
+        total = 0
+        # Every buffer is swapped out before any batch is delivered, so an
+        # event emitted by a subscriber waits for the next dispatch whatever
+        # its kind
+        batches = []
+        for kind in self.order:
+            batch = self.buffers[kind]
+            if batch.records:
+                (self.buffers[kind], self.spares[kind]) = (self.spares[kind], batch)
+                batches.append(batch)
+        for batch in batches:
+            count = len(batch.records)
+            subscribers = self.subscribers[batch.kind]
+            for callback in subscribers:
+                callback(batch)
+            self.emitted[batch.kind] += count
+            self.delivered += count * len(subscribers)
+            total += count
+            batch.clear()
+        self.peak = max(self.peak, total)
+        self.dispatches += 1
+        self.time += time.time() - start
+
+    def stats(self):
+        total = sum(self.emitted.itervalues())
+        ticks = self.dispatches or 1
+        return {"events": total, "per_tick": total / float(ticks), "peak": self.peak,
+                "delivered": self.delivered,
+                "by_kind": dict((k, n / float(ticks)) for (k, n) in self.emitted.iteritems()),
+                "dispatch_ms": self.time / ticks * 1000.0,
+                "events_per_sec": total / self.time if self.time else 0.0}
+
+    def report(self):
+        s = self.stats()
+        kinds = ", ".join("%s %.1f" % (k, s["by_kind"][k]) for k in self.order)
+        return ("Events: %d (%.1f/tick: %s), peak %d/tick, %d deliveries, dispatch %.3fms/tick, "
+                "%.0f events/sec" % (s["events"], s["per_tick"], kinds, s["peak"],
+                                     s["delivered"], s["dispatch_ms"], s["events_per_sec"]))
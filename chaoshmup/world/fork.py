@@ -0,0 +1,232 @@
+# Copyright (c) 2010, Morgan Lokhorst-Blight 
+# All rights reserved. 
+# 
+# Redistribution and use in source and binary forms, with or without 
+# modification, are permitted provided that the following conditions are met: 
+# 
+#  * Redistributions of source code must retain the above copyright notice, 
+#    this list of conditions and the following disclaimer. 
+#  * Redistributions in binary form must reproduce the above copyright 
+#    notice, this list of conditions and the following disclaimer in the 
+#    documentation and/or other materials provided with the distribution. 
+# 
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR AND CONTRIBUTORS ``AS IS'' AND ANY 
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED 
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE 
+# DISCLAIMED. IN NO EVENT SHALL THE AUTHOR OR CONTRIBUTORS BE LIABLE FOR ANY 
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES 
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR 
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER 
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT 
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY 
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH 
+# DAMAGE. 
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+import pygame
+
+import paths
+from systems import integrate
+
+# A simulation-only clone of a World for looking ahead, made by
+# World.fork(). It shares images, animations and everything else immutable
+# with the world and copies only the physics state it changes, and steps
+# movement, paths and projectile hits with no sprites, timers, particles or
+# drawing. Weapons don't fire in a fork, so it only sees projectiles that
+# already exist. With an area, only entities whose rects touch it are
+# forked, which keeps forks for one entity's decisions small; select, as
+# for EntityStore.fork, picks rows some other way. A fork can be forked
+# again, copy-on-write over its own state, to try several moves from the
+# same starting point without selecting and copying the area each time.
+class WorldFork(object):
+    def __init__(self, source, area=None, select=None):
+        self.source = source
+        self.width = source.width
+        self.height = source.height
+        if area is not None:
+            select = lambda arch: area.collidelistall([s.rect for s in arch.columns["sprite"]])
+        self.store = source.store.fork(select)
+        self.time = 0.0
+        self.dead = set()
+        self.hits = []
+        self.shots = None
+        self.ships = None
+        self.extents = {}
+
+    def fork(self):
+        child = WorldFork(self)
+        child.time = self.time
+        child.dead = set(self.dead)
+        # Rows don't move between a fork and its children
+        (child.shots, child.ships) = (self.gather_shots(), self.gather_ships())
+        return child
+
+    def step(self, delta):
+        self.move(delta)
+        self.collide()
+
+    def move(self, delta):
+        for arch in self.store.query("transform", "path"):
+            arch.write("x", "y", "orientation", "path_distance")
+            paths.advance(arch, delta)
+        for arch in self.store.query("transform", "physics"):
+            arch.write("x", "y", "vx", "vy")
+            integrate(arch.columns, len(arch), delta)
+        self.time += delta
+
+    # Projectiles against ships of other teams, as rects around the forked
+    # positions; a hit spends the projectile and damages the ship
+    def collide(self):
+        Rect = pygame.Rect
+        archetypes = self.store.archetypes
+        dead = self.dead
+        (shots, rects) = self.shot_rects()
+        if not shots:
+            return
+        spent = set()
+        for (key, rows) in self.gather_ships():
+            arch = archetypes[key]
+            (x, y) = (arch.columns["x"], arch.columns["y"])
+            health = None
+            for (i, hw, hh, w, h, handle, team, _) in rows:
+                if handle in dead:
+                    continue
+                for j in Rect(x[i] - hw, y[i] - hh, w, h).collidelistall(rects):
+                    (shot, shot_team, damage) = shots[j][5:]
+                    if j in spent or shot_team == team or shot in dead:
+                        continue
+                    if health is None:
+                        health = arch.write("health")[0]
+                    health[i] -= damage
+                    spent.add(j)
+                    dead.add(shot)
+                    self.hits.append((handle, shot))
+                    if health[i] <= 0:
+                        dead.add(handle)
+                        break
+
+    # The gathered rows of every projectile, and rects around their forked
+    # positions. Given a rect to look in, numpy first drops the shots whose
+    # centres are too far away to touch it, so only those that might get
+    # rects; the caller still tests the rects themselves.
+    def shot_rects(self, within=None):
+        Rect = pygame.Rect
+        archetypes = self.store.archetypes
+        shots = []
+        rects = []
+        for (key, rows) in self.gather_shots():
+            c = archetypes[key].columns
+            (x, y) = (c["x"], c["y"])
+            if within is not None and numpy is not None and len(rows) >= 32:
+                (xs, ys) = (numpy.frombuffer(x)[:len(rows)], numpy.frombuffer(y)[:len(rows)])
+                (hx, hy) = self.extent(key, rows)
+                (cx, cy) = within.center
+                close = numpy.nonzero((abs(xs - cx) <= within.width / 2 + hx) &
+                                      (abs(ys - cy) <= within.height / 2 + hy))[0]
+                rows = [rows[k] for k in close]
+            shots.extend(rows)
+            rects.extend(Rect(x[i] - hw, y[i] - hh, w, h) for (i, hw, hh, w, h, _, _, _) in rows)
+        return (shots, rects)
+
+    # The largest size of any of an archetype's gathered rows, with a pixel
+    # to spare for rounding
+    def extent(self, key, rows):
+        try:
+            return self.extents[key]
+        except KeyError:
+            e = self.extents[key] = (max(r[3] for r in rows) + 1, max(r[4] for r in rows) + 1)
+            return e
+
+    # Sizes, teams and damage don't change in a fork, so they're gathered
+    # once per archetype as (row, half width, half height, width, height,
+    # handle, team, damage)
+    def gather(self, arch):
+        c = arch.columns
+        (sprites, teams) = (c["sprite"], c["team"])
+        rows = []
+        for i in xrange(len(arch)):
+            r = sprites[i].rect
+            rows.append((i, r.width / 2, r.height / 2, r.width, r.height,
+                         arch.handles[i], teams[i], getattr(sprites[i], "damage", 0)))
+        return (arch.components, rows)
+
+    def gather_shots(self):
+        if self.shots is None:
+            self.shots = [self.gather(a) for a in self.store.query("transform", "team")
+                          if "health" not in a.fields]
+        return self.shots
+
+    def gather_ships(self):
+        if self.ships is None:
+            self.ships = [self.gather(a) for a in self.store.query("transform", "health", "team")]
+        return self.ships
+
+    def position(self, handle):
+        (arch, row) = self.store.locate(handle)
+        return (arch.columns["x"][row], arch.columns["y"][row])
+
+    def health(self, handle):
+        return self.store.get(handle, "health")
+
+    def alive(self, handle):
+        return handle not in self.dead
+
+    def steer(self, handle, velocity, acceleration=(0, 0)):
+        (arch, row) = self.store.locate(handle)
+        (vx, vy, ax, ay) = arch.write("vx", "vy", "ax", "ay")
+        (vx[row], vy[row]) = velocity
+        (ax[row], ay[row]) = acceleration
+
+# Tries each velocity for an entity, horizon seconds ahead, and returns the
+# one that leaves it alive with the most health (the first such on ties)
+# along with every option's score. Only the entity's own path differs
+# between options, so the shots in the area around it (reach should cover
+# how far the fastest shots travel in the horizon) are forked and stepped
+# once, recording at every step those the entity could reach at its top
+# speed by then. Each option then steps a fork of the entity alone against
+# those records. Other ships are left out, so a shot one of them would
+# have stopped still counts against the entity.
+def lookahead(world, entity, options, horizon=0.25, delta=1 / 30.0, reach=256):
+    handle = entity.handle
+    area = entity.rect.inflate(reach * 2, reach * 2)
+    def shots(arch):
+        if "health" in arch.fields or "team" not in arch.fields:
+            return []
+        return area.collidelistall([s.rect for s in arch.columns["sprite"]])
+    base = WorldFork(world, select=shots)
+    (home, row) = world.store.locate(handle)
+    speed = home.columns["max_vel"][row]
+    steps = []
+    while base.time < horizon:
+        base.move(delta)
+        bound = int(speed * base.time + 1) * 2
+        reachable = entity.rect.inflate(bound, bound)
+        (shots, rects) = base.shot_rects(reachable)
+        near = reachable.collidelistall(rects)
+        steps.append(([shots[j] for j in near], [rects[j] for j in near]))
+    mover = WorldFork(world, select=lambda arch: [row] if arch is home else [])
+    (w, h) = entity.rect.size
+    team = entity.team
+    scores = []
+    for velocity in options:
+        fork = mover.fork()
+        fork.steer(handle, velocity)
+        health = entity.health
+        spent = set()
+        for (shots, rects) in steps:
+            fork.move(delta)
+            (x, y) = fork.position(handle)
+            for j in pygame.Rect(x - w / 2, y - h / 2, w, h).collidelistall(rects):
+                (shot, shot_team, damage) = shots[j][5:]
+                if shot_team != team and shot not in spent:
+                    health -= damage
+                    spent.add(shot)
+            if health <= 0:
+                break
+        scores.append(health if health > 0 else -1.0)
+    best = max(range(len(options)), key=lambda i: scores[i])
+    return (options[best], scores)
@@ -0,0 +1,154 @@
+# Copyright (c) 2010, Morgan Lokhorst-Blight 
+# All rights reserved. 
+# 
+# Redistribution and use in source and binary forms, with or without 
+# modification, are permitted provided that the following conditions are met: 
+# 
+#  * Redistributions of source code must retain the above copyright notice, 
+#    this list of conditions and the following disclaimer. 
+#  * Redistributions in binary form must reproduce the above copyright 
+#    notice, this list of conditions and the following disclaimer in the 
+#    documentation and/or other materials provided with the distribution. 
+# 
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR AND CONTRIBUTORS ``AS IS'' AND ANY 
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED 
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE 
+# DISCLAIMED. IN NO EVENT SHALL THE AUTHOR OR CONTRIBUTORS BE LIABLE FOR ANY 
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES 
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR 
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER 
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT 
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY 
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH 
+# DAMAGE. 
+
+import mmap
+import random
+import struct
+import time
+from collections import OrderedDict
+
+import pygame
+
+# Level files hold one or more background layers, each cut into horizontal
+# chunks of raw RGB pixels. The file is memory-mapped and only the chunks
+# near the view are decoded into surfaces, so memory and draw cost don't
+# depend on the level's length.
+#
+#   header: MAGIC, chunk width, chunk height, layer count
+#   layer:  parallax factor, transparent flag, chunk count, data offset
+#   chunks: width * height * 3 bytes each, layer by layer, in scroll order
+MAGIC = "CHLV0001"
+HEADER = struct.Struct("<8sIII")
+LAYER = struct.Struct("<fIIQ")
+
+def write_level(path, chunk_size, layers):
+    (cw, ch) = chunk_size
+    chunk_bytes = cw * ch * 3
+    offset = HEADER.size + LAYER.size * len(layers)
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, cw, ch, len(layers)))
+        for (parallax, transparent, chunks) in layers:
+            f.write(LAYER.pack(parallax, int(transparent), len(chunks), offset))
+            offset += chunk_bytes * len(chunks)
+        for (parallax, transparent, chunks) in layers:
+            for c in chunks:
+                f.write(pygame.image.tostring(c, "RGB"))
+
+def generate_starfield(path, chunk_size=(640, 128), chunks=16, seed=0):
+    rand = random.Random(seed)
+    (cw, ch) = chunk_size
+    layers = []
+    for (parallax, transparent, stars, colour) in ((0.25, False, 40, (90, 90, 110)),
+                                                   (0.6, True, 25, (170, 170, 200)),
+                                                   (1.0, True, 12, (255, 255, 255))):
+        surfaces = []
+        for i in range(chunks):
+            s = pygame.Surface(chunk_size)
+            s.fill((0, 0, 8) if not transparent else (0, 0, 0))
+            for j in range(stars):
+                s.set_at((rand.randrange(cw), rand.randrange(ch)), colour)
+            surfaces.append(s)
+        layers.append((parallax, transparent, surfaces))
+    write_level(path, chunk_size, layers)
+
+class Level(object):
+    CACHE_CHUNKS = 24
+    def __init__(self, path, cache_chunks=None):
+        self.file = open(path, "rb")
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, cw, ch, count) = HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC:
+            raise ValueError("%s is not a level file" % path)
+        self.chunk_size = (cw, ch)
+        self.chunk_bytes = cw * ch * 3
+        self.layers = [LAYER.unpack_from(self.map, HEADER.size + LAYER.size * i)
+                       for i in range(count)]
+        self.cache = OrderedDict()
+        self.cache_chunks = cache_chunks or self.CACHE_CHUNKS
+        self.hits = 0
+        self.misses = 0
+        self.load_time = 0.0
+        self.worst_load = 0.0
+
+    def close(self):
+        self.cache.clear()
+        self.map.close()
+        self.file.close()
+
+    def chunk(self, layer, index):
+        key = (layer, index)
+        try:
+            surface = self.cache.pop(key)
+            self.hits += 1
+        except KeyError:
+            self.misses += 1
+            start = time.time()
+            (parallax, transparent, count, offset) = self.layers[layer]
+            offset += index * self.chunk_bytes
+            surface = pygame.image.fromstring(self.map[offset:offset + self.chunk_bytes],
+                                              self.chunk_size, "RGB")
+            if pygame.display.get_surface() is not None:
+                surface = surface.convert()
+            if transparent:
+                surface.set_colorkey((0, 0, 0))
+            elapsed = time.time() - start
+            self.load_time += elapsed
+            self.worst_load = max(self.worst_load, elapsed)
+            if len(self.cache) >= self.cache_chunks:
+                self.cache.popitem(last=False)
+        self.cache[key] = surface
+        return surface
+
+    # distance is how far the view has scrolled; each layer moves by its
+    # parallax factor and wraps around at its end. view is the camera offset,
+    # applied with the same parallax, and layers repeat across the width.
+    def draw(self, surface, distance, view=(0, 0)):
+        (cw, ch) = self.chunk_size
+        (width, height) = surface.get_size()
+        batch = []
+        for (layer, (parallax, transparent, count, offset)) in enumerate(self.layers):
+            bottom = (distance + view[1]) * parallax
+            first = int(bottom // ch)
+            last = int((bottom + height) // ch)
+            shift = int(view[0] * parallax) % cw
+            columns = range(shift - cw if shift else 0, width, cw)
+            for c in xrange(first, last + 1):
+                y = int(height - ((c + 1) * ch - bottom))
+                chunk = self.chunk(layer, c % count)
+                batch.extend((chunk, (x, y)) for x in columns)
+        surface.blits(batch, False)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {"cached": len(self.cache), "capacity": self.cache_chunks,
+                "hit_rate": self.hits / float(lookups) if lookups else 0.0,
+                "loads": self.misses,
+                "load_ms": self.load_time / self.misses * 1000.0 if self.misses else 0.0,
+                "worst_ms": self.worst_load * 1000.0}
+
+    def report(self):
+        s = self.stats()
+        s["hit_rate"] *= 100.0
+        return ("Level: %(cached)d/%(capacity)d chunks cached, %(hit_rate).1f%% hits, "
+                "%(loads)d loads averaging %(load_ms).2fms (worst %(worst_ms).2fms)" % s)
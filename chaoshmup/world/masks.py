@@ -0,0 +1,86 @@
+# Copyright (c) 2010, Morgan Lokhorst-Blight 
+# All rights reserved. 
+# 
+# Redistribution and use in source and binary forms, with or without 
+# modification, are permitted provided that the following conditions are met: 
+# 
+#  * Redistributions of source code must retain the above copyright notice, 
+#    this list of conditions and the following disclaimer. 
+#  * Redistributions in binary form must reproduce the above copyright 
+#    notice, this list of conditions and the following disclaimer in the 
+#    documentation and/or other materials provided with the distribution. 
+# 
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR AND CONTRIBUTORS ``AS IS'' AND ANY 
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED 
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE 
+# DISCLAIMED. IN NO EVENT SHALL THE AUTHOR OR CONTRIBUTORS BE LIABLE FOR ANY 
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES 
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR 
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER 
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT 
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY 
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH 
+# DAMAGE. 
+
+import pygame
+
+# Narrowphase collision masks, built once per (animation frame, quantized
+# rotation) and shared by every entity showing that frame.
+class MaskCache(object):
+    ROTATION_STEP = 5
+    SWEEP_STEP = 4
+    def __init__(self, step=None):
+        self.step = step or self.ROTATION_STEP
+        self.masks = {}
+        self.tests = 0
+        self.overlaps = 0
+        self.hits = 0
+        self.misses = 0
+
+    def mask(self, entity):
+        image = entity.images[entity.animation[entity.frame]]
+        steps = 360 // self.step
+        rotation = int(round(entity.last_orientation / float(self.step))) % steps
+        key = (id(image), rotation)
+        try:
+            m = self.masks[key]
+            self.hits += 1
+        except KeyError:
+            self.misses += 1
+            if rotation:
+                image = pygame.transform.rotate(image, rotation * self.step)
+            m = self.masks[key] = pygame.mask.from_surface(image)
+        return m
+
+    # motion is how far b moved this tick; fast movers are also tested at
+    # points back along that path so they can't skip over thin masks.
+    def collide(self, a, b, motion=(0, 0)):
+        self.tests += 1
+        ma = self.mask(a)
+        mb = self.mask(b)
+        (wa, ha) = ma.get_size()
+        (wb, hb) = mb.get_size()
+        (ax, ay) = a.rect.center
+        (bx, by) = b.rect.center
+        ox = (bx - wb / 2.0) - (ax - wa / 2.0)
+        oy = (by - hb / 2.0) - (ay - ha / 2.0)
+        (mx, my) = motion
+        samples = int(max(abs(mx), abs(my)) // self.SWEEP_STEP)
+        for k in xrange(samples + 1):
+            t = k / float(samples) if samples else 0.0
+            offset = (int(round(ox - mx * t)), int(round(oy - my * t)))
+            if ma.overlap(mb, offset) is not None:
+                self.overlaps += 1
+                return True
+        return False
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {"tests": self.tests, "overlaps": self.overlaps,
+                "masks": len(self.masks),
+                "hit_rate": self.hits / float(lookups) if lookups else 0.0}
+
+    def report(self):
+        return ("Masks: %(tests)d narrowphase tests, %(overlaps)d overlaps, "
+                "%(masks)d cached masks, %(hit_rate).1f%% cache hits"
+                % dict(self.stats(), hit_rate=self.stats()["hit_rate"] * 100.0))
@@ -0,0 +1,212 @@
+# Copyright (c) 2010, Morgan Lokhorst-Blight 
+# All rights reserved. 
+# 
+# Redistribution and use in source and binary forms, with or without 
+# modification, are permitted provided that the following conditions are met: 
+# 
+#  * Redistributions of source code must retain the above copyright notice, 
+#    this list of conditions and the following disclaimer. 
+#  * Redistributions in binary form must reproduce the above copyright 
+#    notice, this list of conditions and the following disclaimer in the 
+#    documentation and/or other materials provided with the distribution. 
+# 
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR AND CONTRIBUTORS ``AS IS'' AND ANY 
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED 
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE 
+# DISCLAIMED. IN NO EVENT SHALL THE AUTHOR OR CONTRIBUTORS BE LIABLE FOR ANY 
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES 
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR 
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER 
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT 
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY 
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH 
+# DAMAGE. 
+
+import math
+import random
+import time
+from array import array
+from collections import namedtuple
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+import pygame
+
+Burst = namedtuple("Burst", "texture count speed life spread drag")
+
+# Texture name -> (colour, size in pixels)
+TEXTURES = {
+    "spark": ((255, 220, 96), 2),
+    "debris": ((150, 150, 160), 3),
+    "flash": ((255, 255, 255), 4),
+    "trail": ((96, 160, 255), 2),
+    }
+
+# speed and life are (min, max) ranges, spread is the cone width in degrees,
+# and drag is the share of speed kept every 1/DRAG_RATE seconds
+DRAG_RATE = 60.0
+BURSTS = {
+    "sparks": Burst("spark", 24, (80, 260), (0.15, 0.45), 360, 0.90),
+    "debris": Burst("debris", 10, (30, 120), (0.4, 0.9), 360, 0.96),
+    "muzzle": Burst("flash", 3, (20, 60), (0.04, 0.08), 40, 0.80),
+    "trail": Burst("trail", 2, (40, 90), (0.10, 0.25), 30, 0.85),
+    }
+
+class Particles(object):
+    CAPACITY = 2048
+    MAX_EMIT = 256
+    FRAME_BUDGET = 0.002
+    def __init__(self, capacity=None):
+        self.capacity = capacity or self.CAPACITY
+        self.kinds = sorted(TEXTURES)
+        self.x = array("d", [0.0] * self.capacity)
+        self.y = array("d", [0.0] * self.capacity)
+        self.vx = array("d", [0.0] * self.capacity)
+        self.vy = array("d", [0.0] * self.capacity)
+        self.drag = array("d", [0.0] * self.capacity)
+        self.age = array("d", [0.0] * self.capacity)
+        self.life = array("d", [0.0] * self.capacity)
+        self.kind = array("b", [0] * self.capacity)
+        self.head = 0
+        self.used = 0
+        self.live = 0
+        self.textures = None
+        self.emitted = 0
+        self.dropped = 0
+        self.frame_emitted = 0
+        self.update_time = 0.0
+        self.draw_time = 0.0
+
+    def load_textures(self):
+        self.textures = []
+        for k in self.kinds:
+            (colour, size) = TEXTURES[k]
+            tex = pygame.Surface((size, size))
+            tex.fill(colour)
+            self.textures.append((tex, size / 2.0))
+
+    def emit(self, name, pos, heading=None):
+        burst = BURSTS[name]
+        count = burst.count
+        cost = self.update_time + self.draw_time
+        if cost > self.FRAME_BUDGET:
+            count = int(count * self.FRAME_BUDGET / cost)
+        count = min(count, self.MAX_EMIT - self.frame_emitted)
+        self.dropped += burst.count - max(count, 0)
+        if count <= 0:
+            return
+        self.frame_emitted += count
+        self.emitted += count
+
+        kind = self.kinds.index(burst.texture)
+        if heading is None:
+            heading = random.uniform(0, 360)
+        (smin, smax) = burst.speed
+        (lmin, lmax) = burst.life
+        half = burst.spread / 2.0
+        uniform = random.uniform
+        radians = math.radians
+        i = self.head
+        for n in xrange(count):
+            a = radians(heading + uniform(-half, half))
+            s = uniform(smin, smax)
+            self.x[i] = pos[0]
+            self.y[i] = pos[1]
+            self.vx[i] = -math.sin(a) * s
+            self.vy[i] = -math.cos(a) * s
+            self.drag[i] = burst.drag
+            self.age[i] = 0.0
+            self.life[i] = uniform(lmin, lmax)
+            self.kind[i] = kind
+            i += 1
+            if i >= self.capacity:
+                i = 0
+        self.head = i
+        self.used = min(self.used + count, self.capacity)
+
+    # Ages and moves every live particle, as one numpy pass over the slots
+    # when numpy is available
+    def update(self, delta):
+        start = time.time()
+        n = self.used
+        steps = delta * DRAG_RATE
+        if numpy is not None:
+            view = lambda column: numpy.frombuffer(column)[:n]
+            (x, y, vx, vy) = (view(self.x), view(self.y), view(self.vx), view(self.vy))
+            (drag, age, life) = (view(self.drag), view(self.age), view(self.life))
+            alive = numpy.nonzero(age < life)[0]
+            age[alive] += delta
+            keep = drag[alive] ** steps
+            vx[alive] *= keep
+            vy[alive] *= keep
+            x[alive] += vx[alive] * delta
+            y[alive] += vy[alive] * delta
+            self.live = len(alive)
+        else:
+            (x, y, vx, vy, drag, age, life) = (self.x, self.y, self.vx, self.vy,
+                                               self.drag, self.age, self.life)
+            live = 0
+            for i in xrange(n):
+                a = age[i]
+                if a >= life[i]:
+                    continue
+                age[i] = a + delta
+                d = drag[i] ** steps
+                vx[i] *= d
+                vy[i] *= d
+                x[i] += vx[i] * delta
+                y[i] += vy[i] * delta
+                live += 1
+            self.live = live
+        self.frame_emitted = 0
+        self.update_time = time.time() - start
+
+    def draw(self, surface, dirty=False, offset=(0, 0)):
+        start = time.time()
+        if self.textures is None:
+            self.load_textures()
+        n = self.used
+        if numpy is not None:
+            view = lambda column, dtype=numpy.float64: numpy.frombuffer(column, dtype)[:n]
+            (x, y, kind) = (view(self.x), view(self.y), view(self.kind, numpy.int8))
+            alive = view(self.age) < view(self.life)
+            buckets = []
+            for k in range(len(self.kinds)):
+                (tex, half) = self.textures[k]
+                chosen = alive & (kind == k)
+                buckets.append(zip((x[chosen] + (offset[0] - half)).tolist(),
+                                   (y[chosen] + (offset[1] - half)).tolist()))
+        else:
+            buckets = [[] for k in self.kinds]
+            (x, y, age, life, kind) = (self.x, self.y, self.age, self.life, self.kind)
+            for i in xrange(n):
+                if age[i] < life[i]:
+                    (tex, half) = self.textures[kind[i]]
+                    buckets[kind[i]].append((x[i] + offset[0] - half, y[i] + offset[1] - half))
+        rects = []
+        for (k, points) in enumerate(buckets):
+            if not points:
+                continue
+            tex = self.textures[k][0]
+            batch = [(tex, point) for point in points]
+            if dirty:
+                rects.extend(surface.blits(batch))
+            else:
+                surface.blits(batch, False)
+        self.draw_time = time.time() - start
+        if dirty:
+            return rects
+
+    def stats(self):
+        return {"live": self.live, "capacity": self.capacity,
+                "emitted": self.emitted, "dropped": self.dropped,
+                "update_ms": self.update_time * 1000.0,
+                "draw_ms": self.draw_time * 1000.0}
+
+    def report(self):
+        return ("Particles: %(live)d/%(capacity)d live, %(emitted)d emitted, "
+                "%(dropped)d dropped, update %(update_ms).2fms, "
+                "draw %(draw_ms).2fms" % self.stats())
@@ -0,0 +1,211 @@
+# Copyright (c) 2010, Morgan Lokhorst-Blight 
+# All rights reserved. 
+# 
+# Redistribution and use in source and binary forms, with or without 
+# modification, are permitted provided that the following conditions are met: 
+# 
+#  * Redistributions of source code must retain the above copyright notice, 
+#    this list of conditions and the following disclaimer. 
+#  * Redistributions in binary form must reproduce the above copyright 
+#    notice, this list of conditions and the following disclaimer in the 
+#    documentation and/or other materials provided with the distribution. 
+# 
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR AND CONTRIBUTORS ``AS IS'' AND ANY 
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED 
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE 
+# DISCLAIMED. IN NO EVENT SHALL THE AUTHOR OR CONTRIBUTORS BE LIABLE FOR ANY 
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES 
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR 
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER 
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT 
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY 
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH 
+# DAMAGE. 
+
+import bisect
+import math
+from array import array
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Movement paths, defined as data relative to the follower's origin and
+# sampled once into tables of points evenly spaced along their length. Every
+# path's samples live in one shared table, so a follower only needs the
+# start, sample count and spacing of its path plus the distance it has
+# travelled; positions and headings come from table lookups with no trig.
+#
+# ("bezier", points) chains cubic Bezier segments (1 + 3n points, each
+# segment starting where the last ended); ("spline", points) is a
+# Catmull-Rom spline through the points. Looping paths join their end back
+# to their start; other paths hold their followers at the end.
+PATHS = {
+    "swoop": ("bezier", ((0, 0), (60, 200), (260, 220), (240, 60),
+                         (220, -100), (-200, -100), (-200, 80),
+                         (-200, 260), (-60, -200), (0, 0)), True),
+    "snake": ("spline", ((0, 0), (90, 50), (0, 100), (-90, 150), (0, 200),
+                         (90, 150), (0, 100), (-90, 50)), True),
+    "figure8": ("spline", ((0, 0), (80, -60), (160, 0), (80, 60), (0, 0),
+                           (-80, -60), (-160, 0), (-80, 60)), True),
+    "dive": ("bezier", ((0, 0), (0, 150), (200, 150), (200, 420)), False),
+    }
+
+STEP = 2.0
+SUBDIVISIONS = 64
+
+# The shared table: x, y and heading of every sample of every path built
+table_x = array("d")
+table_y = array("d")
+table_heading = array("d")
+
+class Path(object):
+    def __init__(self, name, kind, points, loop):
+        self.name = name
+        self.loop = loop
+        raw = self.curve(kind, points, loop)
+        # Cumulative length along the finely sampled curve, then evenly
+        # spaced samples along that length
+        lengths = [0.0]
+        for i in range(1, len(raw)):
+            lengths.append(lengths[-1] + math.hypot(raw[i][0] - raw[i - 1][0],
+                                                    raw[i][1] - raw[i - 1][1]))
+        self.length = lengths[-1]
+        # Followers divide by the spacing and length, so a path must go
+        # somewhere
+        if self.length <= 0:
+            raise ValueError("Path %r has no length" % (name,))
+        self.samples = max(2, int(math.ceil(self.length / STEP)) + 1)
+        self.step = self.length / (self.samples - 1)
+        self.start = len(table_x)
+        xs = []
+        ys = []
+        for k in range(self.samples):
+            s = k * self.step
+            i = max(1, min(len(raw) - 1, bisect.bisect_left(lengths, s)))
+            span = lengths[i] - lengths[i - 1]
+            f = (s - lengths[i - 1]) / span if span else 0.0
+            xs.append(raw[i - 1][0] + (raw[i][0] - raw[i - 1][0]) * f)
+            ys.append(raw[i - 1][1] + (raw[i][1] - raw[i - 1][1]) * f)
+        table_x.extend(xs)
+        table_y.extend(ys)
+        # Headings use the same convention as weapons: 0 faces up, and a
+        # heading h faces (-sin h, -cos h)
+        for k in range(self.samples):
+            (a, b) = (max(0, k - 1), min(self.samples - 1, k + 1))
+            if loop and k in (0, self.samples - 1):
+                (a, b) = (self.samples - 2, 1)
+            table_heading.append(math.degrees(math.atan2(-(xs[b] - xs[a]), -(ys[b] - ys[a]))))
+
+    # The point at a distance along the path, wrapped or held at the end
+    # the same way advance() moves followers
+    def sample(self, distance):
+        last = self.samples - 1
+        end = last * self.step
+        distance = distance % end if self.loop else min(distance, end)
+        pos = min(distance / self.step, last - 1e-9)
+        i = int(pos)
+        f = pos - i
+        i += self.start
+        return (distance, (table_x[i] + (table_x[i + 1] - table_x[i]) * f,
+                           table_y[i] + (table_y[i + 1] - table_y[i]) * f))
+
+    def curve(self, kind, points, loop):
+        if kind == "bezier":
+            if loop and points[-1] != points[0]:
+                points = tuple(points) + (points[-1], points[0], points[0])
+            raw = []
+            for j in range(0, len(points) - 3, 3):
+                (p0, p1, p2, p3) = points[j:j + 4]
+                for i in range(SUBDIVISIONS):
+                    t = i / float(SUBDIVISIONS)
+                    u = 1 - t
+                    (a, b, c, d) = (u * u * u, 3 * u * u * t, 3 * u * t * t, t * t * t)
+                    raw.append((a * p0[0] + b * p1[0] + c * p2[0] + d * p3[0],
+                                a * p0[1] + b * p1[1] + c * p2[1] + d * p3[1]))
+            raw.append(tuple(points[-1]))
+            return raw
+        elif kind == "spline":
+            n = len(points)
+            if loop:
+                control = [points[-1]] + list(points) + [points[0], points[1]]
+                spans = n
+            else:
+                control = [points[0]] + list(points) + [points[-1]]
+                spans = n - 1
+            raw = []
+            for j in range(spans):
+                (p0, p1, p2, p3) = control[j:j + 4]
+                for i in range(SUBDIVISIONS):
+                    t = i / float(SUBDIVISIONS)
+                    (t2, t3) = (t * t, t * t * t)
+                    raw.append(tuple(0.5 * (2 * p1[k] + (p2[k] - p0[k]) * t +
+                                            (2 * p0[k] - 5 * p1[k] + 4 * p2[k] - p3[k]) * t2 +
+                                            (3 * p1[k] - p0[k] - 3 * p2[k] + p3[k]) * t3)
+                                     for k in (0, 1)))
+            raw.append(tuple(control[spans + 1]))
+            return raw
+        raise ValueError("Unknown path kind %r" % (kind,))
+
+# Paths are built on first use and shared by every follower
+paths = {}
+
+def path(name):
+    try:
+        return paths[name]
+    except KeyError:
+        (kind, points, loop) = PATHS[name]
+        p = paths[name] = Path(name, kind, points, loop)
+        return p
+
+# Advances every follower in an archetype and writes its position and
+# heading, as one numpy pass over the columns when numpy is available.
+# Followers that were never given a path (no samples) are left where they
+# are.
+def advance(arch, delta):
+    c = arch.columns
+    n = len(arch)
+    if numpy is not None:
+        view = lambda column, dtype=numpy.float64: numpy.frombuffer(column, dtype)
+        samples = view(c["path_samples"], numpy.int_)
+        rows = numpy.nonzero(samples)[0]
+        if not len(rows):
+            return
+        if len(rows) == n:
+            rows = slice(None)
+        distance = view(c["path_distance"])[rows] + view(c["path_speed"])[rows] * delta
+        step = view(c["path_step"])[rows]
+        last = samples[rows] - 1
+        end = last * step
+        loop = view(c["path_loop"], numpy.int8)[rows] != 0
+        distance = numpy.where(loop, distance % end, numpy.minimum(distance, end))
+        view(c["path_distance"])[rows] = distance
+        pos = numpy.minimum(distance / step, last - 1e-9)
+        i = pos.astype(numpy.int_)
+        f = pos - i
+        i += view(c["path_start"], numpy.int_)[rows]
+        (tx, ty) = (view(table_x), view(table_y))
+        view(c["x"])[rows] = view(c["path_x"])[rows] + tx[i] + (tx[i + 1] - tx[i]) * f
+        view(c["y"])[rows] = view(c["path_y"])[rows] + ty[i] + (ty[i + 1] - ty[i]) * f
+        view(c["orientation"])[rows] = view(table_heading)[i + (f >= 0.5)]
+        return
+    (distance, speed, step, samples, loop, start) = (
+        c["path_distance"], c["path_speed"], c["path_step"], c["path_samples"],
+        c["path_loop"], c["path_start"])
+    (x, y, ox, oy, orientation) = (c["x"], c["y"], c["path_x"], c["path_y"], c["orientation"])
+    for r in xrange(n):
+        if not samples[r]:
+            continue
+        last = samples[r] - 1
+        end = last * step[r]
+        d = distance[r] + speed[r] * delta
+        d = d % end if loop[r] else min(d, end)
+        distance[r] = d
+        pos = min(d / step[r], last - 1e-9)
+        i = int(pos)
+        f = pos - i
+        i += start[r]
+        x[r] = ox[r] + table_x[i] + (table_x[i + 1] - table_x[i]) * f
+        y[r] = oy[r] + table_y[i] + (table_y[i + 1] - table_y[i]) * f
+        orientation[r] = table_heading[i + (f >= 0.5)]
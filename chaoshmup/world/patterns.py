@@ -0,0 +1,128 @@
+# Copyright (c) 2010, Morgan Lokhorst-Blight 
+# All rights reserved. 
+# 
+# Redistribution and use in source and binary forms, with or without 
+# modification, are permitted provided that the following conditions are met: 
+# 
+#  * Redistributions of source code must retain the above copyright notice, 
+#    this list of conditions and the following disclaimer. 
+#  * Redistributions in binary form must reproduce the above copyright 
+#    notice, this list of conditions and the following disclaimer in the 
+#    documentation and/or other materials provided with the distribution. 
+# 
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR AND CONTRIBUTORS ``AS IS'' AND ANY 
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED 
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE 
+# DISCLAIMED. IN NO EVENT SHALL THE AUTHOR OR CONTRIBUTORS BE LIABLE FOR ANY 
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES 
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR 
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER 
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT 
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY 
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH 
+# DAMAGE. 
+
+import math
+from array import array
+from itertools import izip
+
+# Bullet patterns, defined as nested emitters and compiled once into flat
+# tables of (angle, speed, spin, aimed) with one entry per bullet, so a
+# volley is a single pass over the table instead of a walk of the pattern.
+#
+# ("shot", speed) is one bullet straight ahead at speed. The rest wrap an
+# inner emitter, which may also be the name of another pattern:
+# ("ring", n, inner) repeats inner n times evenly round the circle;
+# ("fan", n, arc, inner) repeats it n times across arc degrees;
+# ("speeds", (m, ...), inner) repeats it once per speed multiplier;
+# ("spin", degrees, inner) turns inner by degrees more each volley;
+# ("aim", inner) points inner at the target instead of straight ahead;
+# ("each", inner, ...) fires every inner emitter together.
+PATTERNS = {
+    "ring": ("ring", 24, ("shot", 200)),
+    "spiral": ("spin", 11, ("ring", 4, ("shot", 220))),
+    "double_spiral": ("each", ("spin", 9, ("ring", 6, ("shot", 200))),
+                              ("spin", -9, ("ring", 6, ("shot", 160)))),
+    "aimed_burst": ("aim", ("fan", 5, 24, ("speeds", (1.0, 0.8, 0.6), ("shot", 300)))),
+    "flower": ("spin", 7, ("ring", 12, ("fan", 3, 16, ("shot", 180)))),
+    "storm": ("each", ("spin", 3, ("ring", 60, ("speeds", (1.0, 0.75, 0.5),
+                                                ("fan", 3, 6, ("shot", 240))))),
+                      "aimed_burst"),
+    }
+
+# Flattens a pattern into (angle, speed, spin, aimed) entries
+def expand(spec):
+    if isinstance(spec, basestring):
+        return expand(PATTERNS[spec])
+    kind = spec[0]
+    if kind == "shot":
+        return [(0.0, float(spec[1]), 0.0, False)]
+    elif kind == "ring":
+        (count, inner) = spec[1:]
+        entries = expand(inner)
+        return [(angle + 360.0 * i / count, speed, spin, aimed)
+                for i in range(count) for (angle, speed, spin, aimed) in entries]
+    elif kind == "fan":
+        (count, arc, inner) = spec[1:]
+        entries = expand(inner)
+        offsets = [0.0] if count == 1 else [i * arc / (count - 1.0) - arc / 2.0
+                                            for i in range(count)]
+        return [(angle + offset, speed, spin, aimed)
+                for offset in offsets for (angle, speed, spin, aimed) in entries]
+    elif kind == "speeds":
+        (multipliers, inner) = spec[1:]
+        entries = expand(inner)
+        return [(angle, speed * m, spin, aimed)
+                for m in multipliers for (angle, speed, spin, aimed) in entries]
+    elif kind == "spin":
+        (degrees, inner) = spec[1:]
+        return [(angle, speed, spin + degrees, aimed)
+                for (angle, speed, spin, aimed) in expand(inner)]
+    elif kind == "aim":
+        return [(angle, speed, spin, True)
+                for (angle, speed, spin, aimed) in expand(spec[1])]
+    elif kind == "each":
+        entries = []
+        for inner in spec[1:]:
+            entries.extend(expand(inner))
+        return entries
+    raise ValueError("Unknown pattern kind %r" % (kind,))
+
+class Pattern(object):
+    def __init__(self, spec):
+        self.spec = spec
+        entries = expand(spec)
+        self.angle = array("d", [e[0] for e in entries])
+        self.speed = array("d", [e[1] for e in entries])
+        self.spin = array("d", [e[2] for e in entries])
+        self.aimed = array("b", [e[3] for e in entries])
+        self.aims = any(self.aimed)
+
+    def __len__(self):
+        return len(self.angle)
+
+    # Headings for the given volley, relative to facing, or to aim for the
+    # aimed entries
+    def headings(self, volley, facing, aim=0.0):
+        return [angle + spin * volley + (aim if aimed else facing)
+                for (angle, spin, aimed) in izip(self.angle, self.spin, self.aimed)]
+
+    # Thrust for each heading, pointing the way an entity with that
+    # orientation faces
+    @staticmethod
+    def thrust(headings, force):
+        radians = math.radians
+        ax = array("d", [-force * math.sin(radians(h)) for h in headings])
+        ay = array("d", [-force * math.cos(radians(h)) for h in headings])
+        return (ax, ay)
+
+# Patterns are compiled on first use and shared by every weapon firing them;
+# specs not in PATTERNS are cached under the spec itself
+patterns = {}
+
+def pattern(spec):
+    try:
+        return patterns[spec]
+    except KeyError:
+        p = patterns[spec] = Pattern(spec)
+        return p
@@ -0,0 +1,100 @@
+# Copyright (c) 2010, Morgan Lokhorst-Blight 
+# All rights reserved. 
+# 
+# Redistribution and use in source and binary forms, with or without 
+# modification, are permitted provided that the following conditions are met: 
+# 
+#  * Redistributions of source code must retain the above copyright notice, 
+#    this list of conditions and the following disclaimer. 
+#  * Redistributions in binary form must reproduce the above copyright 
+#    notice, this list of conditions and the following disclaimer in the 
+#    documentation and/or other materials provided with the distribution. 
+# 
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR AND CONTRIBUTORS ``AS IS'' AND ANY 
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED 
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE 
+# DISCLAIMED. IN NO EVENT SHALL THE AUTHOR OR CONTRIBUTORS BE LIABLE FOR ANY 
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES 
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR 
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER 
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT 
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY 
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH 
+# DAMAGE. 
+
+import time
+from operator import itemgetter
+
+class Renderer(object):
+    BACKGROUND = (0, 0, 0)
+    def __init__(self, dirty=False):
+        self.dirty = dirty
+        self.last_rects = []
+        self.sprites = 0
+        self.frames = 0
+        self.draw_time = 0.0
+        self.total_sprites = 0
+        self.total_time = 0.0
+
+    def clear(self, surface):
+        surface.fill(self.BACKGROUND)
+
+    # With a camera, sprites outside its view are dropped and the rest are
+    # moved into screen coordinates
+    def collect(self, layers, camera=None):
+        commands = []
+        append = commands.append
+        culled = 0
+        for (layer, group) in enumerate(layers):
+            if camera is None:
+                for s in group.spritedict:
+                    image = s.image
+                    append((layer, id(image), image, s.rect))
+                continue
+            sprites = group.sprites()
+            if camera.cull:
+                visible = camera.view.collidelistall([s.rect for s in sprites])
+                culled += len(sprites) - len(visible)
+                sprites = [sprites[i] for i in visible]
+            (dx, dy) = camera.offset
+            for s in sprites:
+                image = s.image
+                append((layer, id(image), image, s.rect.move(dx, dy) if dx or dy else s.rect))
+        if camera is not None:
+            camera.count(len(commands), culled)
+        commands.sort(key=itemgetter(0, 1))
+        return commands
+
+    # Draws every group in one blits call, lowest layer first. In dirty mode
+    # returns the rects that changed since the last frame (including any
+    # extra rects drawn by the caller), otherwise None.
+    def draw(self, surface, layers, extra=None, camera=None):
+        start = time.time()
+        commands = self.collect(layers, camera)
+        batch = [(c[2], c[3]) for c in commands]
+        if self.dirty:
+            rects = surface.blits(batch) + (extra or [])
+            changed = self.last_rects + rects
+            self.last_rects = rects
+        else:
+            surface.blits(batch, False)
+            changed = None
+
+        self.draw_time = time.time() - start
+        self.sprites = len(batch)
+        self.frames += 1
+        self.total_sprites += self.sprites
+        self.total_time += self.draw_time
+        return changed
+
+    def stats(self):
+        per_sprite = 0.0
+        if self.total_sprites:
+            per_sprite = self.total_time / self.total_sprites * 1e6
+        return {"frames": self.frames, "sprites": self.sprites,
+                "draw_ms": self.draw_time * 1000.0,
+                "us_per_sprite": per_sprite}
+
+    def report(self):
+        return ("Renderer: %(sprites)d sprites, draw %(draw_ms).2fms, "
+                "%(us_per_sprite).2fus/sprite over %(frames)d frames" % self.stats())
@@ -24,31 +24,49 @@
 
 import pygame
 
-from entity import Entity
-from weapons import LaserRepeater, PlasmaRepeater, PlasmaCannon, LaserFan
+import assets
+import paths
+from entity import Entity, stored
+from weapons import LaserRepeater, PlasmaRepeater, PlasmaCannon, LaserFan, LaserBeam
 
 class Ship(Entity):
+    __slots__ = ()
     THRUST_HORIZ = 500
     THRUST_VERT = 500
     THRUST_ROTATE = 40
     HEALTH = 100
+    COMPONENTS = Entity.COMPONENTS + ("health", "weapon", "team")
     def __init__(self, world):
         Entity.__init__(self, world)
         self.team = None
         self.health = self.HEALTH
         self.weapons = []
 
-    def update(self, delta):
-        Entity.update(self, delta)
+    team = stored("team")
+    health = stored("health")
+    weapons = stored("weapons")
+
+    def removed(self):
+        Entity.removed(self)
         for w in self.weapons:
-            w.update(delta)
+            w.disarm()
 
+    # The dead wait a moment for CleanupSystem; they take no more hits
     def hit(self, weapon):
+        if not self.alive:
+            return
         self.health -= weapon.damage
-        if self.health <= 0:
+        events = self.world.events
+        events.emit("hit", self, weapon, weapon.damage)
+        if self.health > 0:
+            self.flash()
+        else:
             self.alive = False
+            (x, y) = self.rect.center
+            events.emit("kill", self, weapon, x, y)
 
 class Enemy(Ship):
+    __slots__ = ()
     START_ORIENTATION = 0
     START_ROTATION = 60
     IMAGE_FILE = "images/i_are_spaceship.png"
@@ -59,11 +77,34 @@ class Enemy(Ship):
         self.weapons = [PlasmaRepeater(self.world, self)]
         self.weapons[0].fire()
         
-    def load_images(self):
-        image = pygame.image.load(self.IMAGE_FILE)
-        self.images = [image.subsurface(pygame.Rect(48,16,16,16))]
+    @classmethod
+    def load_images(cls):
+        image = assets.image(cls.IMAGE_FILE)
+        return [image.subsurface(pygame.Rect(48,16,16,16))]
+
+# An enemy that flies along a shared path table from an origin instead of
+# spinning in place
+class PathEnemy(Enemy):
+    __slots__ = ()
+    START_ROTATION = 0
+    SPEED = 120.0
+    COMPONENTS = Enemy.COMPONENTS + ("path",)
+    def follow(self, name, origin, distance=0.0, speed=None):
+        p = paths.path(name)
+        (arch, row) = self.world.store.locate(self.handle)
+        c = arch.columns
+        c["path_start"][row] = p.start
+        c["path_samples"][row] = p.samples
+        c["path_step"][row] = p.step
+        c["path_loop"][row] = p.loop
+        (distance, (x, y)) = p.sample(distance)
+        c["path_distance"][row] = distance
+        c["path_speed"][row] = speed or self.SPEED
+        (c["path_x"][row], c["path_y"][row]) = origin
+        self.position = (origin[0] + x, origin[1] + y)
 
 class Player(Ship):
+    __slots__ = ("name",)
     IMAGE_FILE = "images/i_are_spaceship.png"
     FRAME_DELAY = 0.1
     def __init__(self, world, name, team):
@@ -72,10 +113,12 @@ class Player(Ship):
         self.team = team
         self.weapons = [LaserRepeater(self.world, self),
                         PlasmaRepeater(self.world, self),
-                        LaserFan(self.world, self)]
+                        LaserFan(self.world, self),
+                        LaserBeam(self.world, self)]
 
-    def load_images(self):
-        image = pygame.image.load(self.IMAGE_FILE)
-        self.images = [image.subsurface(pygame.Rect(0,0,16,32)),
+    @classmethod
+    def load_images(cls):
+        image = assets.image(cls.IMAGE_FILE)
+        return [image.subsurface(pygame.Rect(0,0,16,32)),
                        image.subsurface(pygame.Rect(16,0,16,32))]
 
@@ -0,0 +1,310 @@
+# Copyright (c) 2010, Morgan Lokhorst-Blight 
+# All rights reserved. 
+# 
+# Redistribution and use in source and binary forms, with or without 
+# modification, are permitted provided that the following conditions are met: 
+# 
+#  * Redistributions of source code must retain the above copyright notice, 
+#    this list of conditions and the following disclaimer. 
+#  * Redistributions in binary form must reproduce the above copyright 
+#    notice, this list of conditions and the following disclaimer in the 
+#    documentation and/or other materials provided with the distribution. 
+# 
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR AND CONTRIBUTORS ``AS IS'' AND ANY 
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED 
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE 
+# DISCLAIMED. IN NO EVENT SHALL THE AUTHOR OR CONTRIBUTORS BE LIABLE FOR ANY 
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES 
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR 
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER 
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT 
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY 
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH 
+# DAMAGE. 
+
+import math
+import time
+
+import pygame
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from contrib.vector import Line
+
+import paths
+
+# Systems run over the archetype tables in the world's EntityStore, in the
+# order given by World.SCHEDULE. RATE is how often a system needs to run, in
+# updates per second; None means every tick. A STAGGER system is run every
+# tick over a slice of its rows instead (see Scheduler).
+class System(object):
+    RATE = None
+    STAGGER = False
+    def run(self, world, delta, part=0, parts=1):
+        pass
+
+# Runs systems at their own rates against a nominal tick rate. A system at
+# a third of the tick rate runs every third tick with the time elapsed since
+# its last run, and systems sharing a period are given different phases so
+# their work lands on different ticks. Staggered systems instead run every
+# tick over rows part, part + parts, ... so each row is visited once per
+# period, with the time that period took.
+class Scheduler(object):
+    def __init__(self, systems, tick_rate, multirate=True):
+        self.entries = []
+        phases = {}
+        for s in systems:
+            period = 1
+            if s.RATE and multirate:
+                period = max(1, int(round(tick_rate / float(s.RATE))))
+            phase = phases.get(period, 0)
+            phases[period] = phase + 1
+            self.entries.append({"system": s, "period": period, "phase": phase % period,
+                                 "elapsed": 0.0, "window": [0.0] * period,
+                                 "rate": tick_rate / float(period), "time": 0.0})
+        self.ticks = 0
+
+    def run(self, world, delta, part=0, parts=1):
+        clock = time.time
+        tick = self.ticks
+        for e in self.entries:
+            period = e["period"]
+            if period == 1:
+                (step, part) = (delta, 0)
+            elif e["system"].STAGGER:
+                window = e["window"]
+                e["elapsed"] += delta - window[tick % period]
+                window[tick % period] = delta
+                (step, part) = (e["elapsed"], tick % period)
+            else:
+                e["elapsed"] += delta
+                if (tick + e["phase"]) % period:
+                    continue
+                (step, part, period) = (e["elapsed"], 0, 1)
+                e["elapsed"] = 0.0
+            start = clock()
+            e["system"].run(world, step, part, period)
+            e["time"] += clock() - start
+        self.ticks += 1
+
+    def stats(self):
+        ticks = max(1, self.ticks)
+        rates = {}
+        for e in self.entries:
+            r = rates.setdefault(e["rate"], {"ms": 0.0, "systems": {}})
+            ms = e["time"] / ticks * 1000.0
+            r["ms"] += ms
+            r["systems"][type(e["system"]).__name__] = ms
+        return {"ticks": self.ticks, "rates": rates,
+                "total_ms": sum(r["ms"] for r in rates.values())}
+
+    def report(self):
+        s = self.stats()
+        lines = ["Schedule: %.2fms/tick over %d ticks" % (s["total_ms"], s["ticks"])]
+        for rate in sorted(s["rates"], reverse=True):
+            r = s["rates"][rate]
+            lines.append("  %4.0fHz %6.2fms  %s" % (rate, r["ms"], ", ".join(
+                "%s %.2f" % (name.replace("System", ""), ms)
+                for (name, ms) in sorted(r["systems"].items()))))
+        return "\n".join(lines)
+
+# Moves path followers along their precomputed paths (see paths.py)
+class PathSystem(System):
+    def run(self, world, delta, part=0, parts=1):
+        for arch in world.store.query("transform", "path"):
+            paths.advance(arch, delta)
+
+# Applies acceleration, speed limits and friction to the first n rows of a
+# table's physics columns and moves them; shared with world forks. Big
+# tables (bullets, mostly) go through numpy in one pass when it's available.
+def integrate(c, n, delta):
+    if numpy is not None and n >= 32:
+        view = lambda field: numpy.frombuffer(c[field])[:n]
+        (ax, ay, f) = (view("ax"), view("ay"), view("friction"))
+        (vx, vy) = (view("vx"), view("vy"))
+        vx += ax
+        vy += ay
+        length = numpy.hypot(vx, vy)
+        max_vel = view("max_vel")
+        over = length > max_vel
+        scale = numpy.ones(n)
+        scale[over] = max_vel[over] / length[over]
+        drag = (f != 1) & (length > 0) & (ax == 0) & (ay == 0)
+        scale[drag] *= f[drag] + (1 - f[drag]) * delta
+        vx *= scale
+        vy *= scale
+        view("x")[:] += vx * delta
+        view("y")[:] += vy * delta
+        return
+    hypot = math.hypot
+    (x, y, vx, vy, ax, ay) = (c["x"], c["y"], c["vx"], c["vy"], c["ax"], c["ay"])
+    (max_vel, friction) = (c["max_vel"], c["friction"])
+    for i in xrange(n):
+        # Apply acceleration and clip velocity, apply friction
+        vxi = vx[i] + ax[i]
+        vyi = vy[i] + ay[i]
+        length = hypot(vxi, vyi)
+        if length > max_vel[i]:
+            scale = max_vel[i] / length
+            vxi *= scale
+            vyi *= scale
+        f = friction[i]
+        if f != 1 and length > 0 and ax[i] == 0 and ay[i] == 0:
+            scale = f + (1 - f) * delta
+            vxi *= scale
+            vyi *= scale
+        vx[i] = vxi
+        vy[i] = vyi
+
+        # Move
+        x[i] += vxi * delta
+        y[i] += vyi * delta
+
+class PhysicsSystem(System):
+    def run(self, world, delta, part=0, parts=1):
+        for arch in world.store.query("transform", "physics", "sprite"):
+            c = arch.columns
+            integrate(c, len(arch), delta)
+            (x, y, sprites) = (c["x"], c["y"], c["sprite"])
+            for i in xrange(len(arch)):
+                sprites[i].rect.center = (x[i], y[i])
+
+class BoundsSystem(System):
+    def run(self, world, delta, part=0, parts=1):
+        # Keep players on the screen
+        for p in world.players:
+            r = p.rect
+            if r.left >= 0 and r.top >= 0 and r.right <= world.width and r.bottom <= world.height:
+                continue
+            if r.right > world.width:
+                r.right = world.width
+            if r.left < 0:
+                r.left = 0
+            if r.bottom > world.height:
+                r.bottom = world.height
+            if r.top < 0:
+                r.top = 0
+            p.position = r.center
+
+# Weapon reloads, animation frames and any other timed events
+class TimerSystem(System):
+    def run(self, world, delta, part=0, parts=1):
+        world.timers.advance(delta)
+
+# Rotating sprite images is the expensive part, and a spinning enemy looks
+# the same turned at 30Hz as at 60Hz. The slice is taken by handle rather
+# than by row, as removals swap rows about and would have some entities
+# turned twice in a period and others not at all.
+class AnimationSystem(System):
+    RATE = 30
+    STAGGER = True
+    def run(self, world, delta, part=0, parts=1):
+        nearby = world.camera.nearby
+        for arch in world.store.query("transform", "sprite"):
+            c = arch.columns
+            (orientation, rotation, sprites) = (c["orientation"], c["rotation"], c["sprite"])
+            if parts == 1:
+                rows = xrange(len(arch))
+            else:
+                rows = [i for (i, h) in enumerate(arch.handles) if h.index % parts == part]
+            for i in rows:
+                if rotation[i]:
+                    orientation[i] += rotation[i] * delta
+                # Sprites away from the camera keep turning but aren't rotated
+                if nearby(sprites[i].rect):
+                    sprites[i].animate(orientation[i])
+
+class CollisionSystem(System):
+    def run(self, world, delta, part=0, parts=1):
+        projectiles = world.projectiles.sprites()
+        if not projectiles:
+            return
+        rects = [p.rect for p in projectiles]
+        teams = [p.team for p in projectiles]
+        masks = world.masks
+        spent = set()
+        for enemy in world.enemies:
+            # The dead wait for CleanupSystem, but don't stop shots meanwhile
+            if not enemy.alive:
+                continue
+            hits = enemy.rect.collidelistall(rects)
+            if not hits:
+                continue
+            team = enemy.team
+            for i in hits:
+                if i in spent or teams[i] == team:
+                    continue
+                # Rect broadphase hit; confirm with the cached masks
+                p = projectiles[i]
+                if masks is None or masks.collide(enemy, p, p.velocity * delta):
+                    enemy.hit(p)
+                    spent.add(i)
+        world.remove([projectiles[i] for i in spent])
+
+# Casts every active beam against every ship in one batch: the ships' rects,
+# centres and radii are gathered once, each beam culls them with its bounding
+# box, and the survivors are tested against the beam's Line as circles. Only
+# the nearest hit along each beam takes damage.
+class BeamSystem(System):
+    def run(self, world, delta, part=0, parts=1):
+        if not world.beams:
+            return
+        ships = [s for s in world.enemies.sprites() + world.players.sprites() if s.alive]
+        rects = [s.rect for s in ships]
+        teams = [s.team for s in ships]
+        centres = [r.center for r in rects]
+        radii = [min(r.width, r.height) / 2.0 for r in rects]
+        reach = max(radii or [0])
+        sqrt = math.sqrt
+        for beam in list(world.beams):
+            ((ox, oy), (dx, dy)) = beam.ray()
+            (ex, ey) = (ox + dx * beam.RANGE, oy + dy * beam.RANGE)
+            line = Line.from_points((ox, oy), (ex, ey))
+            ((nx, ny), dist) = (line.direction, line.distance)
+            (ax, ay) = line.along
+            start = ox * ax + oy * ay
+            bounds = pygame.Rect(min(ox, ex) - reach, min(oy, ey) - reach,
+                                 abs(ex - ox) + reach * 2, abs(ey - oy) + reach * 2)
+            team = beam.owner.team
+            nearest = beam.RANGE
+            target = None
+            for i in bounds.collidelistall(rects):
+                if teams[i] == team:
+                    continue
+                (cx, cy) = centres[i]
+                r = radii[i]
+                off = cx * nx + cy * ny - dist
+                if off > r or off < -r:
+                    continue
+                t = cx * ax + cy * ay - start - sqrt(r * r - off * off)
+                if 0 <= t < nearest:
+                    nearest = t
+                    target = ships[i]
+            beam.length = nearest
+            if target is not None:
+                beam.damage = beam.DAMAGE_PER_SECOND * delta
+                target.hit(beam)
+
+class CleanupSystem(System):
+    RATE = 30
+    def run(self, world, delta, part=0, parts=1):
+        world.remove([x for x in world.enemies if not x.alive])
+
+        world.remove([x for x in world.explosions if not x.alive])
+
+        (width, height) = (world.width, world.height)
+        world.remove([x for x in world.projectiles
+                      if x.rect.bottom < 0 or x.rect.right < 0 or
+                      x.rect.left > width or x.rect.top > height])
+
+class EffectsSystem(System):
+    def run(self, world, delta, part=0, parts=1):
+        # Engine trails behind any player under thrust
+        for p in world.players:
+            (ax, ay) = p.acceleration
+            if ax or ay:
+                world.particles.emit("trail", p.rect.center, p.orientation + 180)
+        world.particles.update(delta)
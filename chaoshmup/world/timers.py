@@ -0,0 +1,144 @@
+# Copyright (c) 2010, Morgan Lokhorst-Blight 
+# All rights reserved. 
+# 
+# Redistribution and use in source and binary forms, with or without 
+# modification, are permitted provided that the following conditions are met: 
+# 
+#  * Redistributions of source code must retain the above copyright notice, 
+#    this list of conditions and the following disclaimer. 
+#  * Redistributions in binary form must reproduce the above copyright 
+#    notice, this list of conditions and the following disclaimer in the 
+#    documentation and/or other materials provided with the distribution. 
+# 
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR AND CONTRIBUTORS ``AS IS'' AND ANY 
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED 
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE 
+# DISCLAIMED. IN NO EVENT SHALL THE AUTHOR OR CONTRIBUTORS BE LIABLE FOR ANY 
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES 
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR 
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER 
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT 
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY 
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH 
+# DAMAGE. 
+
+import math
+
+class Timer(object):
+    __slots__ = ("deadline", "tick", "callback", "cancelled")
+    def __init__(self, deadline, tick, callback):
+        self.deadline = deadline
+        self.tick = tick
+        self.callback = callback
+        self.cancelled = False
+
+    # Cancelled timers wait in the wheel until their slot comes round, so let
+    # go of the callback (and whatever it's bound to) now
+    def cancel(self):
+        self.cancelled = True
+        self.callback = None
+
+# Hierarchical timer wheel driven by simulated time. Level 0 has one slot per
+# RESOLUTION seconds; each higher level covers a whole turn of the level below
+# and is cascaded down as time reaches it, so scheduling and expiry are O(1)
+# and ticks with nothing due cost only an empty slot check.
+#
+# Callbacks are called with the Timer and should re-arm from timer.deadline
+# rather than the current time, which keeps periodic timers on an exact
+# cadence however the frame time jitters.
+class TimerWheel(object):
+    RESOLUTION = 0.001
+    LEVEL_BITS = (8, 6, 6, 6)
+    def __init__(self, resolution=None):
+        self.resolution = resolution or self.RESOLUTION
+        self.now = 0.0
+        self.tick = 0
+        self.shifts = []
+        shift = 0
+        for bits in self.LEVEL_BITS:
+            self.shifts.append(shift)
+            shift += bits
+        self.span = 1 << shift
+        self.wheels = [[[] for i in range(1 << bits)] for bits in self.LEVEL_BITS]
+        self.scheduled = 0
+        self.fired = 0
+        self.pending = 0
+
+    def __len__(self):
+        return self.pending
+
+    def schedule(self, deadline, callback):
+        tick = int(math.ceil(deadline / self.resolution - 1e-9))
+        timer = Timer(deadline, tick, callback)
+        self.place(timer)
+        self.scheduled += 1
+        self.pending += 1
+        return timer
+
+    def schedule_in(self, delay, callback):
+        return self.schedule(self.now + delay, callback)
+
+    # One timer per callback, all due at deadline; the slot is found once for
+    # the lot, which is what a volley of animated shots needs
+    def schedule_all(self, deadline, callbacks):
+        tick = int(math.ceil(deadline / self.resolution - 1e-9))
+        timers = [Timer(deadline, tick, callback) for callback in callbacks]
+        self.slot(tick).extend(timers)
+        self.scheduled += len(timers)
+        self.pending += len(timers)
+        return timers
+
+    def place(self, timer, earliest=None):
+        self.slot(timer.tick, earliest).append(timer)
+
+    # The slot for timers due at tick
+    def slot(self, tick, earliest=None):
+        # Anything already due goes in the next slot to be processed
+        if earliest is None:
+            earliest = self.tick + 1
+        tick = max(tick, earliest)
+        diff = min(tick - self.tick, self.span - 1)
+        for (level, bits) in enumerate(self.LEVEL_BITS):
+            if diff < (1 << (self.shifts[level] + bits)):
+                break
+        return self.wheels[level][(tick >> self.shifts[level]) & ((1 << bits) - 1)]
+
+    def cascade(self, level):
+        if level >= len(self.wheels):
+            return
+        slot = (self.tick >> self.shifts[level]) & (len(self.wheels[level]) - 1)
+        if slot == 0:
+            self.cascade(level + 1)
+        timers = self.wheels[level][slot]
+        if timers:
+            self.wheels[level][slot] = []
+            for t in timers:
+                if t.cancelled:
+                    self.pending -= 1
+                else:
+                    # The current level 0 slot hasn't been processed yet
+                    self.place(t, self.tick)
+
+    def advance(self, delta):
+        self.now += delta
+        target = int(self.now / self.resolution + 1e-9)
+        level0 = self.wheels[0]
+        mask = len(level0) - 1
+        while self.tick < target:
+            self.tick += 1
+            slot = self.tick & mask
+            if slot == 0:
+                self.cascade(1)
+            timers = level0[slot]
+            if not timers:
+                continue
+            level0[slot] = []
+            for t in timers:
+                if t.tick > self.tick:
+                    # Clamped beyond the wheel's span; keep waiting
+                    self.place(t)
+                    continue
+                self.pending -= 1
+                if not t.cancelled:
+                    self.fired += 1
+                    t.callback(t)
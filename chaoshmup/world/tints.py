@@ -0,0 +1,120 @@
+# Copyright (c) 2010, Morgan Lokhorst-Blight 
+# All rights reserved. 
+# 
+# Redistribution and use in source and binary forms, with or without 
+# modification, are permitted provided that the following conditions are met: 
+# 
+#  * Redistributions of source code must retain the above copyright notice, 
+#    this list of conditions and the following disclaimer. 
+#  * Redistributions in binary form must reproduce the above copyright 
+#    notice, this list of conditions and the following disclaimer in the 
+#    documentation and/or other materials provided with the distribution. 
+# 
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR AND CONTRIBUTORS ``AS IS'' AND ANY 
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED 
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE 
+# DISCLAIMED. IN NO EVENT SHALL THE AUTHOR OR CONTRIBUTORS BE LIABLE FOR ANY 
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES 
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR 
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER 
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT 
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY 
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH 
+# DAMAGE. 
+
+import pygame
+from pygame.locals import *
+
+# Palettes are a blend applied to a copy of the frame: "multiply" tints the
+# frame's colours, "add" brightens them (white gives a hit flash silhouette).
+PALETTES = {
+    "blue": ("multiply", (120, 170, 255)),
+    "red": ("multiply", (255, 120, 110)),
+    "green": ("multiply", (130, 255, 140)),
+    "gold": ("multiply", (255, 220, 90)),
+    "flash": ("add", (255, 255, 255)),
+    }
+
+# Tinted and rotated frames, made the first time each (frame, palette,
+# rotation step) is asked for and shared by every entity using them; a
+# palette of None is the frame's own colours, rotated. Once their pixels
+# pass MAX_BYTES the least recently used variants are dropped, down to
+# EVICT_TO of the budget so the sort by last use is rare.
+class TintCache(object):
+    ROTATION_STEP = 5
+    MAX_BYTES = 8 * 1024 * 1024
+    EVICT_TO = 0.9
+    def __init__(self, max_bytes=None, step=None):
+        self.max_bytes = max_bytes or self.MAX_BYTES
+        self.step = step or self.ROTATION_STEP
+        # key -> [surface, use count when last looked up]
+        self.variants = {}
+        self.uses = 0
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def variant(self, image, palette, orientation=0):
+        (key, surface, angle) = self.lookup(image, palette, orientation)
+        if surface is None:
+            surface = self.tint(image, palette)
+            if angle:
+                surface = pygame.transform.rotate(surface, angle)
+            self.store(key, surface)
+        return surface
+
+    # The cache key, cached surface (None on a miss) and quantized angle for
+    # a variant; on a miss the caller makes the surface and store()s it
+    def lookup(self, image, palette, orientation=0):
+        rotation = int(round(orientation / float(self.step))) % (360 // self.step)
+        key = (id(image), palette, rotation)
+        entry = self.variants.get(key)
+        if entry is None:
+            self.misses += 1
+            return (key, None, rotation * self.step)
+        self.hits += 1
+        self.uses += 1
+        entry[1] = self.uses
+        return (key, entry[0], rotation * self.step)
+
+    def store(self, key, surface):
+        old = self.variants.get(key)
+        if old is not None:
+            self.bytes -= old[0].get_pitch() * old[0].get_height()
+        self.bytes += surface.get_pitch() * surface.get_height()
+        self.uses += 1
+        self.variants[key] = [surface, self.uses]
+        if self.bytes > self.max_bytes:
+            self.evict(key)
+
+    def evict(self, keep):
+        limit = self.max_bytes * self.EVICT_TO
+        for (k, (old, used)) in sorted(self.variants.iteritems(), key=lambda (k, e): e[1]):
+            if self.bytes <= limit or k == keep:
+                break
+            del self.variants[k]
+            self.bytes -= old.get_pitch() * old.get_height()
+            self.evictions += 1
+
+    def tint(self, image, palette):
+        if palette is None:
+            return image
+        (blend, colour) = PALETTES[palette]
+        surface = image.copy()
+        if blend == "multiply":
+            surface.fill(colour, special_flags=BLEND_RGB_MULT)
+        else:
+            surface.fill(colour, special_flags=BLEND_RGB_ADD)
+        return surface
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {"variants": len(self.variants), "bytes": self.bytes,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / float(lookups) if lookups else 0.0}
+
+    def report(self):
+        s = self.stats()
+        return ("Tints: %d variants in %.1fKB, %.1f%% cache hits, %d evicted" % (
+            s["variants"], s["bytes"] / 1024.0, s["hit_rate"] * 100.0, s["evictions"]))
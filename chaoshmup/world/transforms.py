@@ -0,0 +1,128 @@
+# Copyright (c) 2010, Morgan Lokhorst-Blight 
+# All rights reserved. 
+# 
+# Redistribution and use in source and binary forms, with or without 
+# modification, are permitted provided that the following conditions are met: 
+# 
+#  * Redistributions of source code must retain the above copyright notice, 
+#    this list of conditions and the following disclaimer. 
+#  * Redistributions in binary form must reproduce the above copyright 
+#    notice, this list of conditions and the following disclaimer in the 
+#    documentation and/or other materials provided with the distribution. 
+# 
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR AND CONTRIBUTORS ``AS IS'' AND ANY 
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED 
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE 
+# DISCLAIMED. IN NO EVENT SHALL THE AUTHOR OR CONTRIBUTORS BE LIABLE FOR ANY 
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES 
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR 
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER 
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT 
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY 
+# OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH 
+# DAMAGE. 
+
+import multiprocessing
+import time
+from multiprocessing.pool import ThreadPool
+
+import pygame
+
+# Thread pools shared by every world in the process, by size
+_pools = {}
+def pool(workers):
+    if workers not in _pools:
+        _pools[workers] = ThreadPool(workers)
+    return _pools[workers]
+
+def rotate(job):
+    (image, angle) = job
+    return pygame.transform.rotate(image, angle) if angle else image
+
+def rotate_all(jobs):
+    return [rotate(j) for j in jobs]
+
+# Sprite rotations for a tick, gathered as entities animate and run together
+# just before the images are needed (at the end of World.update and the
+# start of World.draw). pygame's rotate lets go of the GIL while it works,
+# so big batches are split across a pool of threads. Requests for the same
+# frame, palette and angle share one rotation. Every variant, untinted ones
+# included, comes from the world's TintCache (rounded to its rotation step)
+# when it already has it; tinting holds the GIL, so misses are tinted here
+# and only their rotation is farmed out.
+class TransformPool(object):
+    WORKERS = min(multiprocessing.cpu_count(), 8)
+    MIN_PARALLEL = 16
+    def __init__(self, tints, workers=None):
+        self.tints = tints
+        self.workers = workers or self.WORKERS
+        self.pending = {}
+        self.batches = 0
+        self.requested = 0
+        self.rotated = 0
+        self.parallel = 0
+        self.time = 0.0
+
+    def request(self, entity, image, palette, orientation):
+        self.pending[entity] = (image, palette, orientation)
+
+    def cancel(self, entity):
+        self.pending.pop(entity, None)
+
+    def apply(self):
+        if not self.pending:
+            return
+        start = time.time()
+        (pending, self.pending) = (self.pending, {})
+        tints = self.tints
+        jobs = {}
+        done = {}
+        shown = []
+        for (entity, (image, palette, orientation)) in pending.iteritems():
+            if palette or orientation:
+                (key, surface, angle) = tints.lookup(image, palette, orientation)
+                if surface is not None:
+                    done[key] = surface
+                elif key not in jobs:
+                    jobs[key] = (tints.tint(image, palette), angle)
+            else:
+                key = (id(image), None, 0)
+                done[key] = image
+            shown.append((entity, key))
+        if jobs:
+            keys = jobs.keys()
+            work = [jobs[k] for k in keys]
+            if self.workers > 1 and len(work) >= self.MIN_PARALLEL:
+                # One chunk per worker keeps the hand-offs down
+                n = self.workers
+                chunks = [work[i::n] for i in range(n)]
+                results = pool(n).map(rotate_all, chunks)
+                for (i, chunk) in enumerate(results):
+                    for (j, surface) in enumerate(chunk):
+                        done[keys[i + j * n]] = surface
+                self.parallel += len(work)
+            else:
+                for (k, surface) in zip(keys, rotate_all(work)):
+                    done[k] = surface
+            for k in keys:
+                tints.store(k, done[k])
+            self.rotated += len(work)
+        for (entity, key) in shown:
+            entity.show(done[key])
+        self.batches += 1
+        self.requested += len(pending)
+        self.time += time.time() - start
+
+    def stats(self):
+        return {"workers": self.workers, "batches": self.batches,
+                "requested": self.requested, "rotated": self.rotated,
+                "parallel": self.parallel,
+                "reused": self.requested - self.rotated,
+                "ms_per_batch": self.time / self.batches * 1000.0 if self.batches else 0.0}
+
+    def report(self):
+        s = self.stats()
+        return ("Transforms: %d workers, %d batches, %d requests, %d rotated (%d in parallel), "
+                "%d reused, %.2fms/batch" % (s["workers"], s["batches"], s["requested"],
+                                             s["rotated"], s["parallel"], s["reused"],
+                                             s["ms_per_batch"]))
@@ -22,52 +22,101 @@
 # OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH 
 # DAMAGE. 
 
+import math
 import random
+from itertools import izip
 
 import pygame
 
 from contrib import vector
 
-from chaoshmup.world import Entity
+from chaoshmup.world import assets, patterns
+from chaoshmup.world.entity import Entity, stored
 
+# Projectiles take their owner's team but keep no reference to the owner,
+# which would keep a dead ship and its weapons alive while its shots fly
 class Projectile(Entity):
+    __slots__ = ("damage",)
     DAMAGE = 1
+    THRUST = 1000
+    COMPONENTS = Entity.COMPONENTS + ("team",)
     def __init__(self, world, owner, pos, heading=0, acceleration=(0,1000)):
         Entity.__init__(self, world)
-        self.owner = owner
-        self.rect.center = pos
+        self.team = owner.team
+        self.position = pos
         self.orientation = heading
+        self.animate(heading)
         self.acceleration = vector.Vector(acceleration).rotated(180-heading)
+        self.launched()
+
+    team = stored("team")
+
+    # A whole volley from pos, one shot per heading: the store rows and frame
+    # timers are made in one go each, and the thrust comes from the pattern
+    # tables rather than a vector per shot. speeds is a sequence of per-shot
+    # top speeds, or None for MAX_VEL.
+    @classmethod
+    def volley(cls, world, owner, pos, headings, speeds=None):
+        n = len(headings)
+        (ax, ay) = patterns.Pattern.thrust(headings, cls.THRUST)
+        shots = [cls.__new__(cls) for i in xrange(n)]
+        handles = world.store.create_many(cls.COMPONENTS, n, sprite=shots,
+                                          x=pos[0], y=pos[1], orientation=headings,
+                                          rotation=cls.START_ROTATION,
+                                          max_vel=cls.MAX_VEL if speeds is None else speeds,
+                                          friction=cls.FRICTION_MULTIPLIER,
+                                          ax=ax, ay=ay, team=owner.team)
+        center = (pos[0], pos[1])
+        for (shot, handle, heading) in izip(shots, handles, headings):
+            Entity.__init__(shot, world, handle)
+            shot.rect.center = center
+            shot.animate(heading)
+            shot.launched()
+        if shots and len(shots[0].animation) > 1:
+            timers = world.timers.schedule_all(world.timers.now + cls.FRAME_DELAY,
+                                               [shot.frame_due for shot in shots])
+            for (shot, timer) in izip(shots, timers):
+                shot.frame_timer = timer
+        return shots
+
+    # Called once the shot is in the store and heading off
+    def launched(self):
         self.damage = self.DAMAGE
 
 class LaserBolt(Projectile):
+    __slots__ = ()
     IMAGE_FILE = "images/i_are_spaceship.png"
     MAX_VEL=1000
     DAMAGE = 50
-    def load_images(self):
-        image = pygame.image.load(self.IMAGE_FILE)
-        self.images = [image.subsurface(pygame.Rect(32,16,8,8))]
+    @classmethod
+    def load_images(cls):
+        image = assets.image(cls.IMAGE_FILE)
+        return [image.subsurface(pygame.Rect(32,16,8,8))]
 
 class PlasmaBall(Projectile):
+    __slots__ = ()
     IMAGE_FILE = "images/i_are_spaceship.png"
     FRAME_DELAY = 0.05
     DEFAULT_ANIMATION = "throb"
     MAX_VEL=250
     DAMAGE=100
-    def __init__(self, world, owner, pos, heading=0, acceleration=(0,1000)):
-        Projectile.__init__(self, world, owner, pos, heading, acceleration)
+    def launched(self):
+        Projectile.launched(self)
         self.frame = random.randint(0,len(self.animation)-1)
 
-    def load_images(self):
-        image= pygame.image.load(self.IMAGE_FILE)
-        self.images = [image.subsurface(pygame.Rect(48,0,8,8)),
+    @classmethod
+    def load_images(cls):
+        image = assets.image(cls.IMAGE_FILE)
+        return [image.subsurface(pygame.Rect(48,0,8,8)),
                        image.subsurface(pygame.Rect(48,8,8,8)),
                        image.subsurface(pygame.Rect(56,0,8,8)),
                        image.subsurface(pygame.Rect(56,8,8,8))]
 
-    def load_animations(self):
-        Projectile.load_animations(self)
-        self.animations["throb"] = [3,2,1,0,1,2]
+    @classmethod
+    def load_animations(cls, images):
+        animations = super(PlasmaBall, cls).load_animations(images)
+        animations["throb"] = [3,2,1,0,1,2]
+        return animations
 
 class Weapon(Entity):
     PROJECTILE_TYPE = None
@@ -81,55 +130,139 @@ class Weapon(Entity):
 
         self.world.projectiles.add(self.PROJECTILE_TYPE(self.world, self.owner,
                                                         self.owner.position, self.owner.orientation))
+        self.fired(1)
 
     def release(self):
         pass
 
-    def update(self, delta):
+    def disarm(self):
         pass
 
+    def fired(self, shots):
+        (x, y) = self.owner.rect.center
+        self.world.events.emit("fire", self, shots, x, y, self.owner.orientation)
+
 class RepeaterWeapon(Weapon):
     RATE_OF_FIRE = 0.0
     def __init__(self, world, owner):
         Weapon.__init__(self, world, owner)
         self.firing = False
-        self.reload = 0.0
+        self.ready = world.timers.now + self.RATE_OF_FIRE
+        self.timer = None
         
     def fire(self):
         self.firing = True
+        if self.timer is None and self.PROJECTILE_TYPE is not None:
+            self.timer = self.world.timers.schedule(max(self.ready, self.world.timers.now),
+                                                    self.reloaded)
 
     def release(self):
         self.firing = False
 
+    def disarm(self):
+        self.firing = False
+        if self.timer:
+            self.timer.cancel()
+            self.timer = None
+
+    def reloaded(self, timer):
+        # Only re-armed while the trigger is held, so idle weapons cost nothing
+        if not self.firing:
+            self.ready = timer.deadline
+            self.timer = None
+            return
+        self.spawn_projectile()
+        self.ready = timer.deadline + self.RATE_OF_FIRE
+        self.timer = self.world.timers.schedule(self.ready, self.reloaded)
+
     def spawn_projectile(self):
         self.world.projectiles.add(
             self.PROJECTILE_TYPE(self.world, self.owner,
                                  self.owner.position, self.owner.orientation))
+        self.fired(1)
 
-    def update(self, delta):
-        self.reload += delta
-        if self.reload >= self.RATE_OF_FIRE:
-            if self.PROJECTILE_TYPE is None:
-                return
+# Fires a bullet pattern (see patterns.py) as one batched volley per shot.
+# Aimed patterns point at the nearest ship on another team, or straight
+# ahead when there is none.
+class PatternWeapon(RepeaterWeapon):
+    PATTERN = None
+    def __init__(self, world, owner, pattern=None):
+        RepeaterWeapon.__init__(self, world, owner)
+        self.pattern = patterns.pattern(pattern or self.PATTERN)
+        self.volleys = 0
+
+    def spawn_projectile(self):
+        owner = self.owner
+        facing = owner.orientation
+        aim = self.aim(facing) if self.pattern.aims else facing
+        headings = self.pattern.headings(self.volleys, facing, aim)
+        shots = self.PROJECTILE_TYPE.volley(self.world, owner, owner.position,
+                                            headings, self.pattern.speed)
+        self.world.projectiles.add(shots)
+        self.volleys += 1
+        self.fired(len(shots))
 
-            if self.firing:
-                self.spawn_projectile()
-            self.reload = 0.0
+    def aim(self, default):
+        (x, y) = self.owner.rect.center
+        team = self.owner.team
+        best = None
+        for group in (self.world.players, self.world.enemies):
+            for ship in group:
+                if ship.team != team and ship.alive:
+                    (dx, dy) = (ship.rect.centerx - x, ship.rect.centery - y)
+                    d = dx * dx + dy * dy
+                    if best is None or d < best[0]:
+                        best = (d, dx, dy)
+        if best is None:
+            return default
+        return math.degrees(math.atan2(-best[1], -best[2]))
 
-class FanWeapon(RepeaterWeapon):
+# A single fan of NUM_PROJECTILES across ARC degrees at the projectile's
+# own top speed
+class FanWeapon(PatternWeapon):
     ARC = 0.0
     NUM_PROJECTILES = 0
-    def calc_angle(self, i):
-        half_arc = self.ARC / 2.0
-        return i * self.ARC / (self.NUM_PROJECTILES - 1) - half_arc
-    def spawn_projectile(self):
-        proj = []
-        for i in range(self.NUM_PROJECTILES):
-            proj.append(self.PROJECTILE_TYPE(self.world, self.owner,
-                                             self.owner.position,
-                                             self.owner.orientation + self.calc_angle(i)))
-        self.world.projectiles.add(proj)
-    
+    def __init__(self, world, owner):
+        PatternWeapon.__init__(self, world, owner,
+                               ("fan", self.NUM_PROJECTILES, self.ARC,
+                                ("shot", self.PROJECTILE_TYPE.MAX_VEL)))
+
+
+# Continuous beams don't spawn projectiles; while firing they are registered
+# with the world, and BeamSystem ray-casts every active beam once per tick.
+class BeamWeapon(Weapon):
+    RANGE = 400.0
+    DAMAGE_PER_SECOND = 300.0
+    WIDTH = 3
+    COLOUR = (255, 64, 64)
+    def __init__(self, world, owner):
+        Weapon.__init__(self, world, owner)
+        self.firing = False
+        self.damage = 0.0
+        self.length = self.RANGE
+
+    def fire(self):
+        self.firing = True
+        self.world.beams.add(self)
+
+    def release(self):
+        self.firing = False
+        self.world.beams.discard(self)
+
+    def disarm(self):
+        self.release()
+
+    def ray(self):
+        (x, y) = self.owner.rect.center
+        heading = math.radians(self.owner.orientation)
+        return ((x, y), (-math.sin(heading), -math.cos(heading)))
+
+    def draw(self, surface, offset=(0, 0)):
+        ((x, y), (dx, dy)) = self.ray()
+        (x, y) = (x + offset[0], y + offset[1])
+        end = (x + dx * self.length, y + dy * self.length)
+        pygame.draw.line(surface, self.COLOUR, (x, y), end, self.WIDTH)
+
 class LaserRepeater(RepeaterWeapon):
     PROJECTILE_TYPE = LaserBolt
     RATE_OF_FIRE = 0.1
@@ -146,3 +279,6 @@ class LaserFan(FanWeapon):
     RATE_OF_FIRE = 0.1
     ARC = 60.0
     NUM_PROJECTILES = 5
+
+class LaserBeam(BeamWeapon):
+    pass